@@ -0,0 +1,72 @@
+import os
+import time
+import argparse
+
+# Keep BLAS single-threaded so the numbers measure the kernel thread pool
+for var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+
+import numpy as np
+import simulation as S
+
+
+def gate_sequence(n):
+    # A mix of the kernels simulate() uses, on low, middle and high qubits
+    mid, last = n // 2, n - 1
+    cz = S.controlled_matrix(S.GATES["z"], 1)
+    return [
+        ("H q0", lambda st: S.apply_gate(st, S.GATES["h"], 0, n)),
+        (f"H q{mid}", lambda st: S.apply_gate(st, S.GATES["h"], mid, n)),
+        (f"H q{last}", lambda st: S.apply_gate(st, S.GATES["h"], last, n)),
+        (f"CX q0 → q{last}", lambda st: S.apply_cx(st, 0, last, n)),
+        (f"CCZ q0, q{mid} → q{last}", lambda st: S.apply_ccz(st, 0, mid, last, n)),
+        ("2-qubit unitary", lambda st: S.apply_matrix(st, np.kron(S.GATES["h"], S.GATES["y"]),
+                                                      [1, mid], n)),
+        ("deferred CZ phase", lambda st: S.apply_phases(st, {(0, mid): S.diagonal_of(cz)}, n)),
+        ("X/CX permutation", lambda st: S.apply_permutation(st, n, [(0,), (mid, last)])),
+    ]
+
+
+def time_sequence(n, workers, repeats):
+    # The 1-thread baseline also runs the block kernels, on a 1-worker pool
+    S.set_workers(workers, always_pool=True)
+    rng = np.random.default_rng(0)
+    state = rng.normal(size=2 ** n) + 1j * rng.normal(size=2 ** n)
+    state /= np.linalg.norm(state)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _, kernel in gate_sequence(n):
+            state = kernel(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thread-pool scaling of the statevector kernels")
+    parser.add_argument("--min-qubits", type=int, default=20)
+    parser.add_argument("--max-qubits", type=int, default=28)
+    parser.add_argument("--step", type=int, default=2)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    workers = [1]
+    while workers[-1] * 2 <= args.max_workers:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != args.max_workers:
+        workers.append(args.max_workers)
+
+    print(f"{len(gate_sequence(args.min_qubits))} kernels per run, best of {args.repeats}")
+    print(f"{'qubits':>6} {'threads':>7} {'seconds':>9} {'speedup':>8}")
+    for n in range(args.min_qubits, args.max_qubits + 1, args.step):
+        baseline = None
+        for w in workers:
+            seconds = time_sequence(n, w, args.repeats)
+            baseline = baseline or seconds
+            print(f"{n:>6} {w:>7} {seconds:>9.3f} {baseline / seconds:>7.2f}x")
+    S.set_workers(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import os
+import json
+import argparse
+import numpy as np
+import multiprocessing as mp
+from multiprocessing.connection import Listener, Client
+from collections import Counter
+from simulation import compile_steps, controlled_matrix, apply_matrix, bit_labels
+
+# Shared secret for ranks started outside this process
+AUTHKEY_ENV = "QUCPL_AUTHKEY"
+
+
+def plan_exchanges(order, g, controls, targets):
+    # (global, local) position swaps that bring every target local, applied
+    # to `order` in place. A qubit the gate does not use is evicted first,
+    # then a control (controls work from either side). Every rank runs the
+    # same plan, so the parent can dry-run it before any worker starts.
+    swaps = []
+    for q in targets:
+        gpos = order.index(q)
+        if gpos < g:
+            local = range(g, len(order))
+            free = ([p for p in local if order[p] not in controls and order[p] not in targets]
+                    + [p for p in local if order[p] in controls])
+            if not free:
+                raise ValueError(f"no local qubit left to swap with qubit {q}")
+            order[gpos], order[free[0]] = order[free[0]], order[gpos]
+            swaps.append((gpos, free[0]))
+    return swaps
+
+
+class Shard:
+    """One rank's slice of a statevector sharded over 2^g ranks.
+
+    Positions 0..g-1 are "global": their bits are the rank number (most
+    significant first). The other n - g positions are local to every shard.
+    `order[p]` is the logical qubit at position p, so a gate whose targets
+    are all local runs on the shard alone. A global target is first swapped
+    with a local position the gate does not use, which moves half of the
+    shard to and from the rank that differs in that bit. Global controls
+    never move anything: ranks where they are 0 just skip the gate.
+    """
+
+    def __init__(self, rank, n, g, peers):
+        self.rank = rank
+        self.n = n
+        self.g = g
+        self.local = n - g
+        self.peers = peers
+        self.order = list(range(n))
+        self.amps = np.zeros(2 ** self.local, dtype=np.complex128)
+        if rank == 0:
+            self.amps[0] = 1.0
+        self.bytes_sent = 0
+
+    def rank_bit(self, position):
+        return (self.rank >> (self.g - 1 - position)) & 1
+
+    def exchange(self, gpos, lpos):
+        # Swap the amplitudes of a global and a local position (the plan has
+        # already swapped `order`). This rank keeps
+        # the half whose local bit equals its own rank bit and trades the
+        # other half with the partner rank.
+        bit = self.rank_bit(gpos)
+        partner = self.rank ^ (1 << (self.g - 1 - gpos))
+        conn = self.peers[partner]
+        view = self.amps.reshape(2 ** (lpos - self.g), 2, -1)
+        outgoing = np.ascontiguousarray(view[:, 1 - bit])
+        # The lower rank sends first so two large sends never block each other
+        if self.rank < partner:
+            conn.send_bytes(outgoing)
+            incoming = conn.recv_bytes()
+        else:
+            incoming = conn.recv_bytes()
+            conn.send_bytes(outgoing)
+        view[:, 1 - bit] = np.frombuffer(incoming, dtype=np.complex128).reshape(outgoing.shape)
+        self.bytes_sent += outgoing.nbytes
+
+    def apply(self, controls, matrix, targets):
+        for gpos, lpos in plan_exchanges(self.order, self.g, controls, targets):
+            self.exchange(gpos, lpos)
+        where = {q: p for p, q in enumerate(self.order)}
+        if any(where[c] < self.g and not self.rank_bit(where[c]) for c in controls):
+            return
+        local_controls = [where[c] - self.g for c in controls if where[c] >= self.g]
+        if local_controls:
+            matrix = controlled_matrix(matrix, len(local_controls))
+        qubits = local_controls + [where[q] - self.g for q in targets]
+        self.amps = apply_matrix(self.amps, matrix, qubits, self.local)
+
+    def marginal(self, qubits):
+        # Unnormalized probabilities of the bit patterns on `qubits` held here
+        m = len(qubits)
+        where = {q: p for p, q in enumerate(self.order)}
+        offsets = np.arange(2 ** self.local)
+        key = np.zeros(2 ** self.local, dtype=np.int64)
+        for j, q in enumerate(qubits):
+            p = where[q]
+            if p < self.g:
+                bits = self.rank_bit(p)
+            else:
+                bits = (offsets >> (self.n - 1 - p)) & 1
+            key += bits << (m - 1 - j)
+        return np.bincount(key, weights=np.abs(self.amps) ** 2, minlength=2 ** m)
+
+
+def connect_peers(rank, g, listener, book, authkey):
+    # One connection per partner rank (ranks one bit apart). Each rank dials
+    # its lower partners, then accepts the higher ones, so no cycle of
+    # handshakes can wait on itself.
+    partners = [rank ^ (1 << b) for b in range(g)]
+    peers = {}
+    for p in sorted(p for p in partners if p < rank):
+        conn = Client(book[p], authkey=authkey)
+        conn.send(rank)
+        peers[p] = conn
+    for _ in range(sum(p > rank for p in partners)):
+        conn = listener.accept()
+        peers[conn.recv()] = conn
+    return peers
+
+
+def worker_main(coordinator, host, authkey):
+    # One rank: dial the coordinator for a rank and the job, listen on `host`
+    # for peers and publish that address, get every rank's address back,
+    # then run the whole gate list and return this shard's marginal and
+    # counters. Locally spawned ranks and ones started with
+    # `python distributed.py --connect` both run this.
+    conn = Client(coordinator, authkey=authkey)
+    rank, peers = None, {}
+    try:
+        rank, n, g, steps, measured = conn.recv()
+        with Listener((host, 0), backlog=2 ** g, authkey=authkey) as listener:
+            conn.send(("address", listener.address))
+            book = conn.recv()
+            peers = connect_peers(rank, g, listener, book, authkey)
+        shard = Shard(rank, n, g, peers)
+        for controls, matrix, targets in steps:
+            shard.apply(controls, matrix, targets)
+        probs = shard.marginal(measured) if measured else None
+        conn.send(("ok", probs, shard.bytes_sent))
+    except Exception as e:
+        try:
+            conn.send(("error", f"rank {rank}: {e!r}"))
+        except OSError:
+            pass  # the coordinator has already given up
+    finally:
+        for peer in peers.values():
+            peer.close()
+        conn.close()
+
+
+def reply(conn):
+    # Next message from a rank, raising the error it reported instead
+    message = conn.recv()
+    if message[0] == "error":
+        raise RuntimeError(message[1])
+    return message[1:]
+
+
+def simulate_distributed(ir, shards=4, host="localhost", shots=1024, seed=None, exact=False,
+                         coordinator=None, authkey=None):
+    # Run the IR with the statevector split over `shards` ranks (a power of
+    # two) that exchange amplitudes over sockets. By default the ranks are
+    # worker processes spawned on this machine, binding `host`. With
+    # coordinator=(address, port) nothing is spawned: the coordinator listens
+    # there and waits for `shards` ranks started elsewhere with
+    # `python distributed.py --connect address:port`, sharing `authkey`
+    # (bytes, or the AUTHKEY_ENV environment variable).
+    qubit_index = {q: i for i, q in enumerate(ir["qubits"])}
+    n = len(qubit_index)
+    if shards < 1 or shards & (shards - 1):
+        raise ValueError("shards must be a power of two")
+    g = shards.bit_length() - 1
+    steps, measured = compile_steps(ir["instructions"], qubit_index)
+    order = list(range(n))
+    try:
+        exchanges = sum(len(plan_exchanges(order, g, c, t)) for c, _, t in steps)
+    except ValueError:
+        raise ValueError(f"{n} qubits are too few to shard {shards} ways") from None
+
+    if coordinator is None:
+        address, authkey = (host, 0), os.urandom(16)
+    else:
+        address, authkey = tuple(coordinator), authkey or os.environ.get(AUTHKEY_ENV, "").encode()
+        if not authkey:
+            raise ValueError(f"external ranks need an authkey (or {AUTHKEY_ENV} set)")
+    procs, conns = [], []
+    try:
+        with Listener(address, backlog=shards, authkey=authkey) as listener:
+            if coordinator is None:
+                procs = [mp.Process(target=worker_main, args=(listener.address, host, authkey))
+                         for _ in range(shards)]
+                for p in procs:
+                    p.start()
+            # Ranks are numbered in the order they connect
+            conns = [listener.accept() for _ in range(shards)]
+        for rank, conn in enumerate(conns):
+            conn.send((rank, n, g, steps, measured))
+        book = {rank: reply(conn)[0] for rank, conn in enumerate(conns)}
+        for conn in conns:
+            conn.send(book)
+        replies = [reply(conn) for conn in conns]
+    except BaseException:
+        for p in procs:
+            p.terminate()
+        raise
+    finally:
+        for conn in conns:
+            conn.close()
+        for p in procs:
+            p.join()
+
+    info = {"qubits": n, "shards": shards, "local_qubits": n - g, "gates": len(steps),
+            "exchanges": exchanges, "bytes_sent": sum(r[1] for r in replies)}
+    if not measured:
+        return Counter(), info
+    m = len(measured)
+    probs = sum(r[0] for r in replies)
+    probs = probs / probs.sum()
+    if exact:
+        keys = np.flatnonzero(probs)
+        return dict(zip(bit_labels(keys, m), probs[keys].tolist())), info
+    hits = np.random.default_rng(seed).multinomial(shots, probs)
+    keys = np.flatnonzero(hits)
+    return Counter(dict(zip(bit_labels(keys, m), hits[keys].tolist()))), info
+
+
+def parse_address(text):
+    address, _, port = text.rpartition(":")
+    return address, int(port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded statevector demo, or one external rank")
+    parser.add_argument("--connect", type=parse_address, metavar="HOST:PORT",
+                        help=f"run one rank for the coordinator at HOST:PORT ({AUTHKEY_ENV} "
+                             "holds the shared authkey)")
+    parser.add_argument("--host", default="localhost",
+                        help="address this rank listens on; other ranks must reach it")
+    args = parser.parse_args()
+    if args.connect:
+        worker_main(args.connect, args.host, os.environ[AUTHKEY_ENV].encode())
+    else:
+        with open("ghz_ir.json") as f:
+            ir = json.load(f)
+        counts, info = simulate_distributed(ir, shards=2)
+        print(f"✅ {info['shards']} shards × {info['local_qubits']} local qubits, "
+              f"{info['exchanges']} exchanges ({info['bytes_sent']} bytes)")
+        print(counts)
@@ -0,0 +1,99 @@
+import numpy as np
+from collections import deque
+
+POLICIES = {"none", "every", "barriers", "ring"}
+
+
+class StateHistory:
+    """Snapshots of the statevector taken while a circuit runs.
+
+    policy:
+      "none"     - keep nothing
+      "every"    - a snapshot every `every` gates
+      "barriers" - a snapshot at each barrier, labelled with the barrier's
+                   "label" if it has one
+      "ring"     - like "every", but only the last `size` snapshots are kept
+
+    With compress=True a snapshot is stored as the sparse difference from the
+    previous one (indices and new values of the amplitudes that moved by more
+    than `tolerance`). When that difference would be larger than
+    `keyframe_fill` of the state, the snapshot is stored dense instead.
+    """
+
+    def __init__(self, policy="every", every=1, size=8, compress=False, tolerance=0.0,
+                 keyframe_fill=0.25):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown snapshot policy '{policy}'")
+        self.policy = policy
+        self.every = max(1, int(every))
+        self.size = size
+        self.compress = compress
+        self.tolerance = tolerance
+        self.keyframe_fill = keyframe_fill
+        # (gate, label, kind, payload); kind "dense" holds a copy of the
+        # state, kind "delta" holds (indices, values) against the entry before
+        self.entries = deque()
+        self.last = None  # the most recent snapshot, dense
+
+    def wants_gate(self, gate):
+        return self.policy in {"every", "ring"} and gate % self.every == 0
+
+    def wants_barrier(self):
+        return self.policy == "barriers"
+
+    def record(self, state, gate, label=None):
+        state = np.array(state)
+        if self.compress and self.last is not None and self.last.shape == state.shape:
+            changed = np.flatnonzero(np.abs(state - self.last) > self.tolerance)
+            if len(changed) <= self.keyframe_fill * state.size:
+                self.entries.append((gate, label, "delta", (changed, state[changed])))
+                self.last[changed] = state[changed]
+                self.trim()
+                return
+        self.entries.append((gate, label, "dense", state))
+        if self.compress:
+            self.last = state.copy()
+        self.trim()
+
+    def trim(self):
+        # Drop the oldest ring entries; the new oldest becomes a dense
+        # keyframe so the rest still has something to apply deltas to
+        if self.policy != "ring":
+            return
+        while len(self.entries) > self.size:
+            base = self.entries.popleft()[3]
+            gate, label, kind, payload = self.entries[0]
+            if kind == "delta":
+                base[payload[0]] = payload[1]
+                self.entries[0] = (gate, label, "dense", base)
+
+    def snapshot(self, i):
+        # The full state of entry i, rebuilt from the last dense entry before it
+        start = i
+        while self.entries[start][2] != "dense":
+            start -= 1
+        state = self.entries[start][3].copy()
+        for j in range(start + 1, i + 1):
+            indices, values = self.entries[j][3]
+            state[indices] = values
+        return state
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        # (gate, label, state) for every snapshot, oldest first
+        state = None
+        for gate, label, kind, payload in self.entries:
+            if kind == "dense":
+                state = payload.copy()
+            else:
+                state[payload[0]] = payload[1]
+            yield gate, label, state.copy()
+
+    def nbytes(self):
+        # Memory held by the snapshots themselves
+        total = 0
+        for _, _, kind, payload in self.entries:
+            total += payload.nbytes if kind == "dense" else payload[0].nbytes + payload[1].nbytes
+        return total
@@ -0,0 +1,75 @@
+import numpy as np
+from collections import deque
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "quiet": 100}
+
+
+class LogSink:
+    """Runtime log written line by line as the simulation runs.
+
+    Lines below `level` are dropped. Accepted lines go straight to `path`
+    (None keeps no file) and the last `tail` of them stay in memory for
+    simulate()'s return value, so memory does not grow with the circuit.
+    append() is info(), so code written against a plain list still works.
+    """
+
+    def __init__(self, path=None, level="info", tail=200):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level '{level}'")
+        self.path = path
+        self.threshold = LEVELS[level]
+        self.lines = deque(maxlen=tail)
+        self.file = open(path, "w", encoding="utf-8") if path else None
+
+    def enabled(self, level):
+        return LEVELS[level] >= self.threshold
+
+    def log(self, line, level="info"):
+        if LEVELS[level] < self.threshold:
+            return
+        self.lines.append(line)
+        if self.file is not None:
+            self.file.write(line + "\n")
+
+    def debug(self, line):
+        self.log(line, "debug")
+
+    def info(self, line):
+        self.log(line, "info")
+
+    def warning(self, line):
+        self.log(line, "warning")
+
+    append = info
+
+    def tail(self):
+        return list(self.lines)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def log_amplitudes(logs, amps, n, amplitudes="top", top_k=32, indices=None):
+    # Final statevector lines in basis order: "all" of them, the "nonzero"
+    # ones or the "top" top_k by magnitude; "none" logs nothing. A sparse
+    # state passes its nonzero amplitudes with their basis indices.
+    if amplitudes == "none":
+        return
+    if indices is None:
+        indices = np.arange(len(amps))
+    if amplitudes == "nonzero":
+        keep = np.flatnonzero(amps)
+    elif amplitudes == "top" and len(amps) > top_k:
+        keep = np.argpartition(np.abs(amps), -top_k)[-top_k:]
+        keep = keep[np.argsort(indices[keep])]
+    elif amplitudes in {"all", "top"}:
+        keep = np.arange(len(amps))
+    else:
+        raise ValueError(f"Unknown amplitude mode '{amplitudes}'")
+    total = 2 ** n
+    logs.info(f"Final Statevector ({len(keep)} of {total} amplitudes):" if len(keep) < total
+              else "Final Statevector:")
+    for i, amp in zip(indices[keep].tolist(), amps[keep].tolist()):
+        logs.info(f"|{format(i, f'0{n}b')}> : {amp.real:.4f} + {amp.imag:.4f}j")
@@ -0,0 +1,198 @@
+import json
+import numpy as np
+from collections import Counter
+from simulation import SWAP, split_single_qubit, instruction_matrix
+from stabilizer import row_labels
+from optimizer import expand_matrix
+
+
+class MPS:
+    """Matrix product state: one (left bond, 2, right bond) tensor per site.
+
+    Tensors are kept in mixed canonical form around ``center`` so each SVD
+    truncation is the optimal one. ``site`` maps a logical qubit to its
+    position in the chain; SWAP instructions and the routing of non-adjacent
+    gates only change this map. ``truncation_error`` accumulates the weight
+    (sum of squared singular values) discarded by truncation.
+    """
+
+    def __init__(self, n, max_bond=64, cutoff=1e-12):
+        self.n = n
+        self.max_bond = max_bond
+        self.cutoff = cutoff
+        self.tensors = [np.array([1, 0], dtype=complex).reshape(1, 2, 1) for _ in range(n)]
+        self.site = list(range(n))   # logical qubit -> site
+        self.qubit = list(range(n))  # site -> logical qubit
+        self.center = 0
+        self.truncation_error = 0.0
+
+    def bond_dims(self):
+        return [t.shape[2] for t in self.tensors[:-1]]
+
+    def move_center(self, target):
+        # Shift the orthogonality center with QR sweeps
+        while self.center < target:
+            i = self.center
+            l, d, r = self.tensors[i].shape
+            q, rmat = np.linalg.qr(self.tensors[i].reshape(l * d, r))
+            self.tensors[i] = q.reshape(l, d, -1)
+            self.tensors[i + 1] = np.tensordot(rmat, self.tensors[i + 1], axes=(1, 0))
+            self.center += 1
+        while self.center > target:
+            i = self.center
+            l, d, r = self.tensors[i].shape
+            q, rmat = np.linalg.qr(self.tensors[i].reshape(l, d * r).T)
+            self.tensors[i] = q.T.reshape(-1, d, r)
+            self.tensors[i - 1] = np.tensordot(self.tensors[i - 1], rmat.T, axes=(2, 0))
+            self.center -= 1
+
+    def svd_truncate(self, theta):
+        # Keep at most max_bond singular values and drop those whose weight
+        # is below cutoff (relative); the kept ones are renormalized.
+        u, s, vh = np.linalg.svd(theta, full_matrices=False)
+        weights = s ** 2
+        total = weights.sum()
+        keep = int(np.count_nonzero(weights > self.cutoff * total))
+        keep = max(1, min(self.max_bond, keep))
+        discarded = weights[keep:].sum()
+        if discarded > 0:
+            self.truncation_error += float(discarded / total)
+        s = s[:keep] * np.sqrt(total / weights[:keep].sum())
+        return u[:, :keep], s, vh[:keep]
+
+    def apply_sites(self, matrix, start, k):
+        # Apply a 2^k matrix to sites start .. start+k-1 (first site = most
+        # significant bit) and split the block back with truncated SVDs.
+        if k == 1:
+            self.tensors[start] = np.einsum('ij,ljr->lir', matrix, self.tensors[start])
+            return
+        self.move_center(start)
+        theta = self.tensors[start]
+        for i in range(start + 1, start + k):
+            theta = np.tensordot(theta, self.tensors[i], axes=(theta.ndim - 1, 0))
+        l, r = theta.shape[0], theta.shape[-1]
+        theta = np.einsum('ij,ljr->lir', matrix, theta.reshape(l, 2 ** k, r))
+        for i in range(start, start + k - 1):
+            rest = theta.shape[1] // 2
+            u, s, vh = self.svd_truncate(theta.reshape(theta.shape[0] * 2, rest * r))
+            self.tensors[i] = u.reshape(-1, 2, len(s))
+            theta = (s[:, None] * vh).reshape(len(s), rest, r)
+        self.tensors[start + k - 1] = theta.reshape(-1, 2, r)
+        self.center = start + k - 1
+
+    def swap_sites(self, i):
+        # Exchange the qubits on sites i and i+1
+        self.apply_sites(SWAP, i, 2)
+        a, b = self.qubit[i], self.qubit[i + 1]
+        self.qubit[i], self.qubit[i + 1] = b, a
+        self.site[a], self.site[b] = i + 1, i
+
+    def apply(self, matrix, qubits):
+        # Route the gate's qubits onto neighbouring sites, then apply it there
+        ordered = sorted(qubits, key=lambda q: self.site[q])
+        start = self.site[ordered[0]]
+        for offset, q in enumerate(ordered[1:], 1):
+            while self.site[q] > start + offset:
+                self.swap_sites(self.site[q] - 1)
+        if ordered != list(qubits):
+            matrix = expand_matrix(matrix, list(qubits), ordered)
+        self.apply_sites(matrix, start, len(qubits))
+
+    def relabel(self, q1, q2):
+        # SWAP of two logical qubits
+        s1, s2 = self.site[q1], self.site[q2]
+        self.site[q1], self.site[q2] = s2, s1
+        self.qubit[s1], self.qubit[s2] = q2, q1
+
+    def to_statevector(self):
+        # Dense amplitudes, logical qubit 0 first; only for small n
+        state = self.tensors[0]
+        for t in self.tensors[1:]:
+            state = np.tensordot(state, t, axes=(state.ndim - 1, 0))
+        state = state.reshape([2] * self.n)
+        return state.transpose(self.site).reshape(-1)
+
+    def sample(self, qubits, shots, rng):
+        # Draw every shot at once, site by site from the left. With the
+        # center on site 0 the rest of the chain is right-canonical, so the
+        # conditional probabilities only need the sites up to the last
+        # measured one.
+        self.move_center(0)
+        last = max(self.site[q] for q in qubits)
+        v = np.ones((shots, 1), dtype=complex)
+        bits = np.zeros((shots, last + 1), dtype=np.int64)
+        for i in range(last + 1):
+            w = np.einsum('sl,ldr->sdr', v, self.tensors[i])
+            probs = np.einsum('sdr,sdr->sd', w, w.conj()).real
+            probs /= probs.sum(axis=1, keepdims=True)
+            bits[:, i] = rng.random(shots) >= probs[:, 0]
+            chosen = w[np.arange(shots), bits[:, i]]
+            v = chosen / np.linalg.norm(chosen, axis=1, keepdims=True)
+        return bits[:, [self.site[q] for q in qubits]]
+
+    def probabilities(self, qubits, limit=2 ** 20):
+        # Exact marginal over `qubits` by expanding every nonzero branch of
+        # the sites up to the last measured one.
+        self.move_center(0)
+        last = max(self.site[q] for q in qubits)
+        v = np.ones((1, 1), dtype=complex)
+        bits = np.zeros((1, 0), dtype=np.int64)
+        for i in range(last + 1):
+            w = np.einsum('sl,ldr->sdr', v, self.tensors[i])
+            probs = np.einsum('sdr,sdr->sd', w, w.conj()).real.reshape(-1)
+            keep = np.flatnonzero(probs > 1e-14)
+            if len(keep) > limit:
+                raise ValueError(f"Exact mode would enumerate more than {limit} branches")
+            bits = np.hstack([bits[keep // 2], (keep % 2)[:, None]])
+            v = w.reshape(-1, w.shape[2])[keep]
+        probs = np.einsum('sr,sr->s', v, v.conj()).real
+        return bits[:, [self.site[q] for q in qubits]], probs / probs.sum()
+
+
+def unique_rows(bits):
+    # np.unique over rows of a 0/1 matrix, compared as packed bytes. Wide
+    # registers would overflow an int64 key, and unique(axis=0) is slow.
+    packed = np.ascontiguousarray(np.packbits(bits.astype(np.uint8), axis=1))
+    rows = packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+    _, first, inverse, counts = np.unique(rows, return_index=True, return_inverse=True,
+                                          return_counts=True)
+    return first, inverse.reshape(-1), counts
+
+
+def simulate_mps(ir, shots=1024, seed=None, exact=False, max_bond=64, cutoff=1e-12):
+    # Counts keyed like simulation.measure, the final MPS and a small info dict
+    qubit_index = {q: i for i, q in enumerate(ir["qubits"])}
+    mps = MPS(len(qubit_index), max_bond, cutoff)
+    measured = []
+
+    for instr in split_single_qubit(ir["instructions"]):
+        op = instr["op"]
+        matrix = instruction_matrix(instr)
+        if matrix is not None:
+            mps.apply(np.asarray(matrix, dtype=complex), [qubit_index[q] for q in instr["args"]])
+        elif op == "swap":
+            mps.relabel(*(qubit_index[q] for q in instr["args"]))
+        elif op == "measure":
+            measured = [qubit_index[q] for q in instr["qubits"]]
+
+    info = {"qubits": mps.n, "max_bond": max(mps.bond_dims(), default=1),
+            "truncation_error": mps.truncation_error}
+    if not measured:
+        return Counter(), mps, info
+    if exact:
+        bits, probs = mps.probabilities(measured)
+        first, inverse, _ = unique_rows(bits)
+        totals = np.bincount(inverse, weights=probs)
+        return dict(zip(row_labels(bits[first]), totals.tolist())), mps, info
+    bits = mps.sample(measured, shots, np.random.default_rng(seed))
+    first, _, counts = unique_rows(bits)
+    return Counter(dict(zip(row_labels(bits[first]), counts.tolist()))), mps, info
+
+
+if __name__ == "__main__":
+    with open("ghz_ir.json") as f:
+        ir = json.load(f)
+    counts, mps, info = simulate_mps(ir)
+    print(f"✅ MPS run on {info['qubits']} qubits, max bond {info['max_bond']}, "
+          f"truncation error {info['truncation_error']:.2e}")
+    print(counts)
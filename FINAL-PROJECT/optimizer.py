@@ -0,0 +1,77 @@
+import json
+import numpy as np
+from simulation import split_single_qubit, is_gate, instruction_matrix
+
+
+def expand_matrix(matrix, qubits, target_qubits):
+    # Embed a matrix acting on `qubits` into the larger ordered set `target_qubits`
+    rest = [q for q in target_qubits if q not in qubits]
+    full = np.kron(matrix, np.eye(2 ** len(rest), dtype=complex))
+    order = list(qubits) + rest
+    perm = [order.index(q) for q in target_qubits]
+    w = len(target_qubits)
+    tensor = full.reshape([2] * (2 * w)).transpose(perm + [p + w for p in perm])
+    return tensor.reshape(2 ** w, 2 ** w)
+
+
+def fuse_gates(instructions, max_width=2):
+    # Greedily merge neighbouring gates into unitaries on at most max_width
+    # qubits. Returns the new instruction list and the number of statevector
+    # passes saved.
+    out = []
+    blocks = []  # open blocks: {"qubits": [...], "matrix": ..., "gates": [...]}
+    saved = 0
+
+    def emit(block):
+        # A block of k gates replaces k statevector passes by one
+        nonlocal saved
+        blocks.remove(block)
+        saved += len(block["gates"]) - 1
+        if len(block["gates"]) == 1:
+            out.append(block["gates"][0])
+        else:
+            out.append({"op": "unitary", "args": block["qubits"], "matrix": block["matrix"],
+                        "fused": len(block["gates"])})
+
+    def flush(qubits=None):
+        for block in list(blocks):
+            if qubits is None or set(block["qubits"]) & set(qubits):
+                emit(block)
+
+    for instr in split_single_qubit(instructions):
+        gate = is_gate(instr)
+        args = instr.get("args", [])
+        if not gate or len(args) > max_width:
+            # Wider gates and SWAP relabels only end the blocks on their own
+            # qubits; measurements, prints, barriers and control flow end all
+            local = gate or instr.get("op") == "swap"
+            flush(args if local else None)
+            out.append(instr)
+            continue
+
+        matrix = instruction_matrix(instr)
+        touching = [b for b in blocks if set(b["qubits"]) & set(args)]
+        qubits = list(dict.fromkeys(q for b in touching for q in b["qubits"]))
+        qubits += [q for q in args if q not in qubits]
+        if len(qubits) > max_width:
+            flush(args)
+            touching, qubits = [], list(args)
+
+        combined = np.eye(2 ** len(qubits), dtype=complex)
+        gates = []
+        for block in touching:
+            combined = expand_matrix(block["matrix"], block["qubits"], qubits) @ combined
+            gates += block["gates"]
+            blocks.remove(block)
+        combined = expand_matrix(matrix, args, qubits) @ combined
+        blocks.append({"qubits": qubits, "matrix": combined, "gates": gates + [instr]})
+
+    flush()
+    return out, saved
+
+
+if __name__ == "__main__":
+    with open("ghz_ir.json") as f:
+        ir = json.load(f)
+    fused, saved = fuse_gates(ir["instructions"])
+    print(f"✅ {len(ir['instructions'])} instructions → {len(fused)}, saved {saved} statevector passes")
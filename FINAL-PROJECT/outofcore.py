@@ -0,0 +1,186 @@
+import os
+import json
+import shutil
+import numpy as np
+from collections import Counter
+from simulation import (SWAP, split_single_qubit, is_gate, split_controls, controlled_matrix,
+                        apply_matrix, bit_labels)
+
+def sidecar_path(path):
+    return path + ".json"
+
+
+def checkpoint_path(path, slot):
+    return f"{path}.ckpt{slot}"
+
+
+class OutOfCoreState:
+    """Statevector kept in a np.memmap file and updated chunk by chunk.
+
+    The file holds 2^n complex128 amplitudes with qubit 0 as the most
+    significant bit, as in simulation.py. A chunk is 2^chunk_qubits
+    consecutive amplitudes, so the last chunk_qubits qubits are local to
+    every chunk and the first n - chunk_qubits ("high") qubits pick the
+    chunk. Gates on local qubits stream through the chunks in file order; a
+    gate on h high qubits gathers the 2^h chunks that differ only in those
+    bits into one in-memory vector and runs the dense kernel on it. High
+    controls just skip the chunks where they are 0.
+    """
+
+    def __init__(self, path, n, chunk_qubits=20, mode="w+"):
+        self.path = path
+        self.n = n
+        self.chunk_qubits = min(chunk_qubits, n)
+        self.high = n - self.chunk_qubits
+        self.chunk = 2 ** self.chunk_qubits
+        self.amps = np.memmap(path, dtype=np.complex128, mode=mode, shape=(2 ** n,))
+        if mode == "w+":
+            self.amps[0] = 1.0
+        self.slot = 1  # checkpoint slot the sidecar points at; the next goes to the other
+
+    def chunk_ids(self, zero_bits, one_bits):
+        # Chunk numbers with the given high qubits cleared / set
+        ids = np.arange(2 ** self.high)
+        for q in zero_bits:
+            ids = ids[(ids >> (self.high - 1 - q)) & 1 == 0]
+        for q in one_bits:
+            ids = ids[(ids >> (self.high - 1 - q)) & 1 == 1]
+        return ids
+
+    def read(self, cid):
+        return np.array(self.amps[cid * self.chunk:(cid + 1) * self.chunk])
+
+    def write(self, cid, values):
+        self.amps[cid * self.chunk:(cid + 1) * self.chunk] = values
+
+    def apply(self, matrix, qubits, controls=()):
+        # matrix acts on `qubits` (first = most significant bit) wherever all
+        # `controls` are 1
+        high_controls = [c for c in controls if c < self.high]
+        low_controls = [c for c in controls if c >= self.high]
+        if low_controls:
+            matrix = controlled_matrix(matrix, len(low_controls))
+            qubits = low_controls + list(qubits)
+
+        # Gathered high qubits lead the local vector, in sorted order
+        gathered = sorted(q for q in qubits if q < self.high)
+        g = len(gathered)
+        position = {q: i for i, q in enumerate(gathered)}
+        local = [position.get(q, g + q - self.high) for q in qubits]
+        offsets = [sum(((j >> (g - 1 - i)) & 1) << (self.high - 1 - q)
+                       for i, q in enumerate(gathered)) for j in range(2 ** g)]
+
+        for base in self.chunk_ids(gathered, high_controls):
+            members = [base + offset for offset in offsets]
+            vector = np.concatenate([self.read(cid) for cid in members])
+            vector = apply_matrix(vector, matrix, local, g + self.chunk_qubits)
+            for j, cid in enumerate(members):
+                self.write(cid, vector[j * self.chunk:(j + 1) * self.chunk])
+
+    def marginal(self, qubits):
+        # Probability of each bit pattern on `qubits` in one pass over the file
+        m = len(qubits)
+        weights = [1 << (m - 1 - j) for j in range(m)]
+        offsets = np.arange(self.chunk)
+        local_key = np.zeros(self.chunk, dtype=np.int64)
+        for q, w in zip(qubits, weights):
+            if q >= self.high:
+                local_key += ((offsets >> (self.n - 1 - q)) & 1) * w
+        probs = np.zeros(2 ** m)
+        for cid in range(2 ** self.high):
+            high_key = sum(w for q, w in zip(qubits, weights)
+                           if q < self.high and (cid >> (self.high - 1 - q)) & 1)
+            probs += np.bincount(local_key + high_key, weights=np.abs(self.read(cid)) ** 2,
+                                 minlength=2 ** m)
+        return probs / probs.sum()
+
+    def checkpoint(self, meta):
+        # Gates update the file in place, so the file itself is never a safe
+        # restart point. Copy it into the checkpoint slot the sidecar does not
+        # point at, then atomically switch the sidecar over; an interruption
+        # anywhere leaves the previous slot and sidecar intact.
+        self.amps.flush()
+        slot = 1 - self.slot
+        shutil.copyfile(self.path, checkpoint_path(self.path, slot))
+        tmp = sidecar_path(self.path) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(meta, n=self.n, chunk_qubits=self.chunk_qubits, slot=slot), f)
+        os.replace(tmp, sidecar_path(self.path))
+        self.slot = slot
+
+    def discard_checkpoints(self):
+        # Drop the sidecar first so no sidecar ever names a missing slot
+        for path in (sidecar_path(self.path), checkpoint_path(self.path, 0),
+                     checkpoint_path(self.path, 1)):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def simulate_out_of_core(ir, path="statevector.dat", shots=1024, seed=None, exact=False,
+                         chunk_qubits=20, checkpoint_every=0, resume=False):
+    # Run the IR with the statevector in `path`. With checkpoint_every > 0
+    # the state is copied to a checkpoint file every checkpoint_every gates
+    # (a full copy of the file each time, so this is opt-in) and a JSON
+    # sidecar records how many gates that copy holds; with resume=True an
+    # interrupted run restarts from the copy. A finished run deletes its
+    # checkpoints. Returns the counts and a small info dict.
+    qubit_labels = ir["qubits"]
+    qubit_index = {q: i for i, q in enumerate(qubit_labels)}
+    n = len(qubit_labels)
+    steps = split_single_qubit(ir["instructions"])
+
+    done = None
+    if resume and os.path.exists(sidecar_path(path)):
+        with open(sidecar_path(path)) as f:
+            meta = json.load(f)
+        if meta["n"] != n or meta["qubits"] != qubit_labels:
+            raise ValueError(f"Checkpoint {path} belongs to a different program")
+        if "slot" not in meta:
+            raise ValueError(f"Checkpoint {path} has no saved copy of the state to resume from")
+        # The working file may hold gates past the checkpoint, or half of
+        # one; restart from the copy taken at the checkpoint instead
+        shutil.copyfile(checkpoint_path(path, meta["slot"]), path)
+        state = OutOfCoreState(path, n, meta["chunk_qubits"], mode="r+")
+        state.slot = meta["slot"]
+        done = meta["next_instruction"]
+    else:
+        state = OutOfCoreState(path, n, chunk_qubits)
+        state.discard_checkpoints()
+
+    info = {"qubits": n, "chunks": 2 ** state.high, "resumed_at": done}
+    done = done or 0
+    measured = []
+    for step, instr in enumerate(steps):
+        op = instr["op"]
+        if op == "measure":
+            measured = [qubit_index[q] for q in instr["qubits"]]
+        if step < done:
+            continue
+        if op == "swap":
+            state.apply(SWAP, [qubit_index[q] for q in instr["args"]])
+        elif is_gate(instr):
+            controls, matrix, targets = split_controls(instr)
+            state.apply(matrix, [qubit_index[q] for q in targets],
+                        [qubit_index[q] for q in controls])
+        if checkpoint_every and (step + 1) % checkpoint_every == 0:
+            state.checkpoint({"qubits": qubit_labels, "next_instruction": step + 1})
+    state.discard_checkpoints()
+
+    if not measured:
+        return Counter(), info
+    m = len(measured)
+    probs = state.marginal(measured)
+    if exact:
+        keys = np.flatnonzero(probs)
+        return dict(zip(bit_labels(keys, m), probs[keys].tolist())), info
+    hits = np.random.default_rng(seed).multinomial(shots, probs)
+    keys = np.flatnonzero(hits)
+    return Counter(dict(zip(bit_labels(keys, m), hits[keys].tolist()))), info
+
+
+if __name__ == "__main__":
+    with open("ghz_ir.json") as f:
+        ir = json.load(f)
+    counts, info = simulate_out_of_core(ir, chunk_qubits=1)
+    print(f"✅ Out-of-core run on {info['qubits']} qubits in {info['chunks']} chunks")
+    print(counts)
@@ -0,0 +1,102 @@
+import json
+import numpy as np
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+from collections import Counter
+from simulation import block_plan, apply_block, compile_steps, measure
+
+# How often the parent checks that no worker has died (e.g. OOM-killed)
+POLL_SECONDS = 0.5
+
+
+def partition(n, qubits, workers):
+    # The first qubits outside the gate index the blocks. For gates below
+    # the top qubits these are the top qubits themselves, i.e. every worker
+    # keeps its own contiguous slice; otherwise the state is repartitioned.
+    count = (workers - 1).bit_length()
+    return tuple(q for q in range(n) if q not in qubits)[:count]
+
+
+def worker_loop(shm_name, n, worker_id, workers, steps, barrier, errors):
+    shm = SharedMemory(name=shm_name)
+    state = np.ndarray((2 ** n,), dtype=np.complex128, buffer=shm.buf)
+    view = None
+    try:
+        for controls, matrix, targets in steps:
+            k = len(targets)
+            tensor = matrix.reshape([2] * (2 * k))
+            split = partition(n, controls + targets, workers)
+            shape, indices, select, t_inner = block_plan(n, split, controls, targets)
+            view = state.reshape(shape)
+            for b in range(worker_id, len(indices), workers):
+                apply_block(view[indices[b]], select, tensor, t_inner)
+            # Nobody starts the next gate until every block of this one is done
+            barrier.wait()
+    except Exception as e:
+        errors.put(f"worker {worker_id}: {e!r}")
+        barrier.abort()
+    finally:
+        del state, view
+        shm.close()
+
+
+def wait_for(procs):
+    # Join every worker. A worker that dies without reaching the barrier
+    # would leave the others waiting forever, so a nonzero exit code
+    # terminates the rest and raises.
+    while True:
+        for w, p in enumerate(procs):
+            if p.exitcode not in (None, 0):
+                for other in procs:
+                    other.terminate()
+                    other.join()
+                raise RuntimeError(f"worker {w} exited with code {p.exitcode}")
+        alive = [p for p in procs if p.is_alive()]
+        if not alive:
+            return
+        alive[0].join(POLL_SECONDS)
+
+
+def simulate_processes(ir, workers=4, shots=1024, seed=None, exact=False):
+    # Run the IR on `workers` processes sharing one statevector. Only the
+    # compiled gate list is pickled; amplitudes stay in shared memory.
+    qubit_index = {q: i for i, q in enumerate(ir["qubits"])}
+    n = len(qubit_index)
+    steps, measured = compile_steps(ir["instructions"], qubit_index)
+    top = set(range((workers - 1).bit_length()))
+    info = {"qubits": n, "workers": workers, "gates": len(steps),
+            "repartitioned": sum(1 for c, _, t in steps if top & set(c + t))}
+
+    shm = SharedMemory(create=True, size=2 ** n * np.dtype(np.complex128).itemsize)
+    try:
+        state = np.ndarray((2 ** n,), dtype=np.complex128, buffer=shm.buf)
+        state[:] = 0
+        state[0] = 1.0
+        barrier = mp.Barrier(workers)
+        errors = mp.Queue()
+        procs = [mp.Process(target=worker_loop, args=(shm.name, n, w, workers, steps, barrier, errors))
+                 for w in range(workers)]
+        for p in procs:
+            p.start()
+        wait_for(procs)
+        if not errors.empty():
+            raise RuntimeError(errors.get())
+
+        if not measured:
+            result_counts = Counter()
+        else:
+            result_counts = measure(state, n, measured, shots=shots, seed=seed, exact=exact)
+        del state
+    finally:
+        shm.close()
+        shm.unlink()
+    return result_counts, info
+
+
+if __name__ == "__main__":
+    with open("ghz_ir.json") as f:
+        ir = json.load(f)
+    counts, info = simulate_processes(ir, workers=2)
+    print(f"✅ {info['workers']} processes, {info['gates']} gates "
+          f"({info['repartitioned']} repartitioned) on {info['qubits']} qubits")
+    print(counts)
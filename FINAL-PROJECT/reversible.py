@@ -0,0 +1,137 @@
+import numpy as np
+from collections import Counter
+
+# Gates that map basis states to basis states: X with any number of
+# controls (last argument is the target) and SWAP
+REVERSIBLE_GATES = {"x", "cx", "ccx", "mcx", "swap"}
+PASSIVE_OPS = {"barrier", "print", "measure"}
+
+
+def is_reversible(instructions):
+    # True if the program never leaves the computational basis
+    return all(instr.get("op") in REVERSIBLE_GATES | PASSIVE_OPS for instr in instructions)
+
+
+def gate_steps(instructions, qubit_index):
+    # (op, qubit indices) of every gate; "x q0, q1" is one step per qubit
+    steps = []
+    for instr in instructions:
+        op = instr.get("op")
+        if op == "x":
+            steps.extend(("x", [qubit_index[q]]) for q in instr["args"])
+        elif op in REVERSIBLE_GATES:
+            steps.append((op, [qubit_index[q] for q in instr["args"]]))
+    return steps
+
+
+def run_reversible(instructions, qubit_index, value=0):
+    """Run a reversible program on one basis state held as a Python int.
+
+    Qubit 0 is the most significant bit, as in simulation.py; Python ints
+    have no width limit, so any number of qubits works.
+    """
+    n = len(qubit_index)
+    for op, qubits in gate_steps(instructions, qubit_index):
+        masks = [1 << (n - 1 - q) for q in qubits]
+        if op == "swap":
+            if bool(value & masks[0]) != bool(value & masks[1]):
+                value ^= masks[0] | masks[1]
+        else:
+            cmask = sum(masks[:-1])
+            if value & cmask == cmask:
+                value ^= masks[-1]
+    return value
+
+
+def from_convert_ir(ir):
+    """Instructions and qubit index for run_reversible from a converter IR.
+
+    The converter dialect is {"binary": ..., "instructions": [{"gate": "x",
+    "target": i}, ...]} with target i = bit i of the value, least
+    significant first. Qubit "q<i>" is placed at position n - 1 - i, so the
+    final basis index run_reversible returns is the value itself.
+    """
+    n = len(ir["binary"])
+    qubit_index = {f"q{i}": n - 1 - i for i in range(n)}
+    instructions = [{"op": instr["gate"], "args": [f"q{instr['target']}"]}
+                    for instr in ir["instructions"]]
+    return instructions, qubit_index
+
+
+def pack_values(values, n):
+    """Pack integers into rows of an (inputs, ceil(n/8)) uint8 bit array.
+
+    The layout matches np.packbits: qubit 0 is the high bit of byte 0.
+    Values that fit in 64 bits go through one vectorized byte view.
+    """
+    width = (n + 7) // 8
+    pad = 8 * width - n
+    values = list(values)
+    if width <= 8:
+        raw = np.array(values, dtype=np.uint64) << np.uint64(pad)
+        return raw.astype('>u8').view(np.uint8).reshape(-1, 8)[:, 8 - width:].copy()
+    data = b"".join((v << pad).to_bytes(width, "big") for v in values)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, width).copy()
+
+
+def unpack_values(packed, n):
+    # Inverse of pack_values, as Python ints
+    pad = 8 * packed.shape[1] - n
+    return [int.from_bytes(row.tobytes(), "big") >> pad for row in packed]
+
+
+def run_reversible_batch(instructions, qubit_index, packed):
+    """Run a reversible program on many basis inputs at once.
+
+    ``packed`` holds one input per row in the pack_values layout; every gate
+    is a handful of vectorized byte operations over the whole batch. Returns
+    a new array in the same layout.
+    """
+    packed = np.array(packed, dtype=np.uint8)
+
+    def column(q):
+        return (packed[:, q >> 3] >> (7 - (q & 7))) & 1
+
+    def toggle(q, bits):
+        packed[:, q >> 3] ^= (bits << (7 - (q & 7))).astype(np.uint8)
+
+    for op, qubits in gate_steps(instructions, qubit_index):
+        if op == "swap":
+            a, b = qubits
+            differ = column(a) ^ column(b)
+            toggle(a, differ)
+            toggle(b, differ)
+        else:
+            *controls, target = qubits
+            hit = np.ones(len(packed), dtype=np.uint8)
+            for c in controls:
+                hit &= column(c)
+            toggle(target, hit)
+    return packed
+
+
+def simulate_reversible(ir, shots=1024, exact=False, value=0):
+    # Deterministic counts of the measured qubits and the final basis index
+    if not is_reversible(ir["instructions"]):
+        raise ValueError("Program uses gates outside X/CX/CCX/MCX/SWAP")
+    qubit_index = {q: i for i, q in enumerate(ir["qubits"])}
+    n = len(qubit_index)
+    final = run_reversible(ir["instructions"], qubit_index, value)
+    bits = format(final, f'0{n}b') if n else ""
+    measured = []
+    for instr in ir["instructions"]:
+        if instr.get("op") == "measure":
+            measured = [qubit_index[q] for q in instr["qubits"]]
+    if not measured:
+        return Counter(), final
+    label = "".join(bits[q] for q in measured)
+    return ({label: 1.0} if exact else Counter({label: shots})), final
+
+
+if __name__ == "__main__":
+    # Toffoli truth table for all eight inputs in one batch
+    qubit_index = {"q0": 0, "q1": 1, "q2": 2}
+    program = [{"op": "ccx", "args": ["q0", "q1", "q2"]}]
+    outputs = run_reversible_batch(program, qubit_index, pack_values(range(8), 3))
+    for value, out in zip(range(8), unpack_values(outputs, 3)):
+        print(f"|{value:03b}> → |{out:03b}>")
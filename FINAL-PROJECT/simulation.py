@@ -1,7 +1,13 @@
 import json
+import time
+import inspect
 import numpy as np
-import matplotlib.pyplot as plt
 from collections import Counter
+from functools import lru_cache
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from history import StateHistory
+from logsink import LogSink, log_amplitudes
 
 # Define single-qubit gates
 GATES = {
@@ -12,6 +18,87 @@ GATES = {
     "i": np.eye(2, dtype=complex)
 }
 
+# Statevector dtypes; single precision halves memory and bandwidth
+PRECISIONS = {
+    "double": np.complex128,
+    "single": np.complex64
+}
+
+# Largest register backend="auto" will still run as a dense statevector
+# (2^28 complex128 amplitudes = 4 GiB) so that it can be rendered
+MAX_DENSE_QUBITS = 28
+
+# Gate kernels split the state into independent blocks over qubits the gate
+# does not touch and run them on this pool; tensordot, elementwise ops and
+# copies release the GIL. States below PARALLEL_MIN_QUBITS stay serial.
+PARALLEL_MIN_QUBITS = 16
+BLOCKS_PER_WORKER = 4
+_workers = 1
+_pool = None
+
+# Basis permutations: X with zero or more controls (last argument is the target)
+PERMUTATION_GATES = {"x", "cx", "ccx", "mcx"}
+# A block of them is gathered as 2^s slice copies over its s support qubits
+# when that is cheaper than one pass per gate. Rough costs, in amplitudes
+# moved: one Python-level slice copy, and the fixed overhead of a gate call.
+SLICE_COST = 1024
+GATE_OVERHEAD = 4096
+
+# Two-qubit SWAP, for kernels that apply it as a matrix
+SWAP = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=complex)
+
+# Multi-controlled ops: the last argument is the target, the rest are controls
+CONTROLLED_GATES = {
+    "ccx": "x",
+    "ccz": "z",
+    "mcx": "x",
+    "mcz": "z"
+}
+
+# Gates whose matrix is diagonal whatever the number of controls
+DIAGONAL_GATES = {"z", "cz", "ccz", "mcz"}
+
+
+def set_workers(workers, always_pool=False):
+    # Size of the kernel thread pool; 1 runs every kernel serially unless
+    # always_pool keeps a 1-worker pool, so one thread runs the same block
+    # kernels as several (what a scaling benchmark should compare)
+    global _workers, _pool
+    if _pool is not None:
+        _pool.shutdown()
+    _workers = max(1, int(workers))
+    _pool = ThreadPoolExecutor(_workers) if _workers > 1 or always_pool else None
+
+
+@contextmanager
+def using_workers(workers):
+    # set_workers(workers) for the duration of a with-block, then restore
+    # the caller's pool size; None leaves the pool alone
+    if workers is None:
+        yield
+        return
+    previous, pooled = _workers, _pool is not None
+    set_workers(workers)
+    try:
+        yield
+    finally:
+        set_workers(previous, always_pool=pooled)
+
+
+def split_qubits(n, qubits):
+    # Highest-order qubits outside `qubits`, enough of them for about
+    # BLOCKS_PER_WORKER blocks per worker; () when running serially
+    if _pool is None or n < PARALLEL_MIN_QUBITS:
+        return ()
+    count = (BLOCKS_PER_WORKER * _workers - 1).bit_length()
+    return tuple(q for q in range(n) if q not in qubits)[:count]
+
+
+def run_blocks(task, count):
+    # task(0) .. task(count - 1) on the pool; re-raises the first error
+    for future in [_pool.submit(task, b) for b in range(count)]:
+        future.result()
+
 
 def kron_n(*ops):
     result = np.array([[1]], dtype=complex)
@@ -20,24 +107,343 @@ def kron_n(*ops):
     return result
 
 
-def apply_gate(state, gate, qubit, n):
-    ops = [GATES["i"]] * n
-    ops[qubit] = gate
-    U = kron_n(*ops)
-    return U @ state
+def controlled_matrix(gate, k):
+    # Full matrix of `gate` with k controls in front: identity except the
+    # block where every control is 1
+    size = np.shape(gate)[0]
+    matrix = np.eye(size * 2 ** k, dtype=complex)
+    matrix[-size:, -size:] = gate
+    return matrix
+
+
+def split_single_qubit(instructions):
+    # "h q0, q1" is one instruction but two gates; give each gate its own entry
+    out = []
+    for instr in instructions:
+        if instr.get("op") in GATES and len(instr["args"]) > 1:
+            out.extend({"op": instr["op"], "args": [q]} for q in instr["args"])
+        else:
+            out.append(instr)
+    return out
+
+
+def instruction_matrix(instr):
+    # Matrix of a gate instruction over its args (first arg = most significant
+    # bit), or None for anything that is not a plain unitary.
+    op = instr.get("op")
+    if op in GATES and len(instr["args"]) == 1:
+        return GATES[op]
+    if op in {"cx", "cy", "cz"}:
+        return controlled_matrix(GATES[op[1]], 1)
+    if op in CONTROLLED_GATES:
+        return controlled_matrix(GATES[CONTROLLED_GATES[op]], len(instr["args"]) - 1)
+    if op == "unitary":
+        return np.asarray(instr["matrix"])
+    return None
+
+
+def is_gate(instr):
+    # True for every unitary instruction; decided by op name, so no matrix
+    # is built for wide controlled gates
+    op = instr.get("op")
+    return (op in GATES or op in {"cx", "cy", "cz", "unitary"} or op in CONTROLLED_GATES)
+
+
+def gate_diagonal(instr):
+    # Diagonal over the args of a diagonal gate, None otherwise. A controlled
+    # Z only changes the all-ones pattern, so its diagonal is ones with the
+    # Z phase at the end; only "unitary" instructions have a matrix to check.
+    op = instr["op"]
+    if op in DIAGONAL_GATES:
+        diag = np.ones(2 ** len(instr["args"]), dtype=complex)
+        diag[-2:] = np.diag(GATES["z"])
+        return diag
+    if op == "unitary":
+        return diagonal_of(instr["matrix"])
+    return None
+
+
+def split_controls(instr):
+    # (controls, base matrix, targets) of a gate, so kernels can select the
+    # control-1 part instead of building the full controlled matrix
+    op, args = instr["op"], instr["args"]
+    if op in {"cx", "cy", "cz"}:
+        return args[:1], GATES[op[1]], args[1:]
+    if op in CONTROLLED_GATES:
+        return args[:-1], GATES[CONTROLLED_GATES[op]], args[-1:]
+    return [], np.asarray(instruction_matrix(instr), dtype=complex), args
+
+
+def compile_steps(instructions, qubit_index):
+    # (controls, matrix, targets) per gate with qubit indices; measured qubits
+    steps, measured = [], []
+    for instr in split_single_qubit(instructions):
+        op = instr["op"]
+        if op == "swap":
+            steps.append(((), SWAP, tuple(qubit_index[q] for q in instr["args"])))
+        elif is_gate(instr):
+            controls, matrix, targets = split_controls(instr)
+            steps.append((tuple(qubit_index[q] for q in controls), np.asarray(matrix, dtype=complex),
+                          tuple(qubit_index[q] for q in targets)))
+        elif op == "measure":
+            measured = [qubit_index[q] for q in instr["qubits"]]
+    return steps, measured
+
+
+def diagonal_of(matrix):
+    # Diagonal entries of a diagonal matrix, None otherwise
+    matrix = np.asarray(matrix)
+    diag = np.diag(matrix)
+    if np.count_nonzero(matrix - np.diag(diag)):
+        return None
+    return diag
+
+
+@lru_cache(maxsize=None)
+def view_shape(n, qubits):
+    # Shape that gives every listed qubit its own length-2 axis; qubit 0 is
+    # the most significant bit, matching the ordering used by kron_n.
+    shape = []
+    prev = 0
+    for q in sorted(qubits):
+        shape += [2 ** (q - prev), 2]
+        prev = q + 1
+    shape.append(2 ** (n - prev))
+    return tuple(shape)
+
+
+def qubit_view(state, n, qubits):
+    return state.reshape(view_shape(n, tuple(qubits)))
+
+
+def qubit_axes(qubits):
+    # Axis of each qubit inside the array returned by qubit_view
+    order = sorted(qubits)
+    return [2 * order.index(q) + 1 for q in qubits]
+
+
+@lru_cache(maxsize=None)
+def control_index(n, controls, target):
+    # Precomputed index mask selecting the all-controls=1 block of the
+    # qubit_view, plus the position of the target axis inside that block.
+    qubits = controls + (target,)
+    axes = qubit_axes(qubits)
+    index = [slice(None)] * len(view_shape(n, qubits))
+    for axis in axes[:-1]:
+        index[axis] = 1
+    t_axis = axes[-1] - sum(axis < axes[-1] for axis in axes[:-1])
+    return tuple(index), t_axis
+
+
+@lru_cache(maxsize=None)
+def block_layout(n, split, qubits):
+    # View shape over split + qubits, the index of each block (every split
+    # axis fixed) and the axes of `qubits` inside one block
+    shape = view_shape(n, split + qubits)
+    axes = qubit_axes(split + qubits)
+    split_axes = axes[:len(split)]
+    inner = [a - sum(s < a for s in split_axes) for a in axes[len(split):]]
+    indices = []
+    for b in range(2 ** len(split)):
+        index = [slice(None)] * len(shape)
+        for j, axis in enumerate(split_axes):
+            index[axis] = (b >> (len(split) - 1 - j)) & 1
+        indices.append(tuple(index))
+    return shape, indices, inner
+
+
+@lru_cache(maxsize=None)
+def block_plan(n, split, controls, targets):
+    # block_layout over controls + targets, plus the index selecting the
+    # all-controls=1 part of a block and the target axes inside that part
+    shape, indices, inner = block_layout(n, split, controls + targets)
+    c_axes, t_axes = inner[:len(controls)], inner[len(controls):]
+    select = [slice(None)] * (len(shape) - len(split))
+    for axis in c_axes:
+        select[axis] = 1
+    t_inner = [a - sum(c < a for c in c_axes) for a in t_axes]
+    return shape, indices, tuple(select), t_inner
+
+
+def apply_block(block, select, tensor, t_inner):
+    # One block of a (controlled) gate, in place: the block holds every
+    # amplitude the gate mixes, so blocks can run on separate workers
+    sub = block[select]
+    k = len(t_inner)
+    out = np.tensordot(tensor, sub, axes=(list(range(k, 2 * k)), t_inner))
+    sub[...] = np.moveaxis(out, list(range(k)), t_inner)
+
+
+def apply_matrix(state, matrix, qubits, n):
+    # Contract a 2^k x 2^k matrix with the k target axes only; the first qubit
+    # in `qubits` is the most significant bit of the matrix index.
+    k = len(qubits)
+    tensor = np.asarray(matrix, dtype=state.dtype).reshape([2] * (2 * k))
+    split = split_qubits(n, qubits)
+    if split:
+        shape, indices, inner = block_layout(n, split, tuple(qubits))
+        src = state.reshape(shape)
+        new_state = np.empty_like(state)
+        dst = new_state.reshape(shape)
+
+        def task(b):
+            out = np.tensordot(tensor, src[indices[b]], axes=(list(range(k, 2 * k)), inner))
+            dst[indices[b]] = np.moveaxis(out, list(range(k)), inner)
+
+        run_blocks(task, len(indices))
+        return new_state
+    view = qubit_view(state, n, qubits)
+    axes = qubit_axes(qubits)
+    out = np.tensordot(tensor, view, axes=(list(range(k, 2 * k)), axes))
+    out = np.moveaxis(out, list(range(k)), axes)
+    return out.reshape(-1)
+
+
+def defer_phase(phases, qubits, diag):
+    # Fold a diagonal gate into the pending phases keyed by sorted qubits;
+    # gates that cancel out (Z.Z, CZ.CZ) drop their entry altogether.
+    order = sorted(qubits)
+    diag = np.asarray(diag).reshape([2] * len(qubits))
+    diag = diag.transpose([qubits.index(q) for q in order]).reshape(-1)
+    key = tuple(order)
+    diag = phases.pop(key, 1) * diag
+    if not np.allclose(diag, 1):
+        phases[key] = diag
+
+
+def apply_phases(state, phases, n, qubits=None):
+    # Multiply the pending phases that touch `qubits` (all if None) into the
+    # state with a single broadcast elementwise multiply.
+    keys = [k for k in phases if qubits is None or set(k) & set(qubits)]
+    if not keys:
+        return state
+    support = sorted(set(q for k in keys for q in k))
+    tensor = np.ones([2] * len(support), dtype=state.dtype)
+    for key in keys:
+        diag = phases.pop(key).astype(state.dtype)
+        shape = [2 if q in key else 1 for q in support]
+        tensor = tensor * diag.reshape(shape)
+    split = split_qubits(n, support)
+    if split:
+        shape, indices, inner = block_layout(n, split, tuple(support))
+        block_shape = [1] * (len(shape) - len(split))
+        for axis in inner:
+            block_shape[axis] = 2
+        tensor = tensor.reshape(block_shape)
+        src = state.reshape(shape)
+        new_state = np.empty_like(state)
+        dst = new_state.reshape(shape)
+
+        def task(b):
+            np.multiply(src[indices[b]], tensor, out=dst[indices[b]])
+
+        run_blocks(task, len(indices))
+        return new_state
+    view = qubit_view(state, n, support)
+    shape = [1] * view.ndim
+    shape[1::2] = [2] * len(support)
+    return (view * tensor.reshape(shape)).reshape(-1)
+
+
+@lru_cache(maxsize=256)
+def permutation_table(block, support):
+    # Compose a block of (controls..., target) X gates into one table over
+    # the 2^s basis states of the support qubits. The gates are folded in
+    # reverse so that new_state[i] = state[table[i]]. Only this 2^s table is
+    # cached, never a 2^n index.
+    s = len(support)
+    bit = {q: 1 << (s - 1 - j) for j, q in enumerate(support)}
+    table = np.arange(2 ** s)
+    for qubits in reversed(block):
+        *controls, target = qubits
+        mask = sum(bit[c] for c in controls)
+        table = table ^ (((table & mask) == mask) * bit[target])
+    return table
+
+
+def gather_pays(n, s, gates):
+    # Whether one gather over 2^s slices beats `gates` separate passes
+    return gates > 1 and 2 ** s * SLICE_COST + 2 ** n // 4 < gates * (2 ** n + GATE_OVERHEAD)
+
+
+def apply_permutation(state, n, block):
+    # Every support pattern of the output is copied from the pattern the
+    # table maps it to: one pass over the state whatever the length of the
+    # block. When gather_pays says the 2^s slice copies cost more than the
+    # passes they save, the gates run one by one through apply_multi_controlled.
+    block = tuple(tuple(qubits) for qubits in block)
+    support = tuple(sorted(set(q for qubits in block for q in qubits)))
+    s = len(support)
+    if not gather_pays(n, s, len(block)):
+        for *controls, target in block:
+            state = apply_multi_controlled(state, controls, target, n, GATES["x"])
+        return state
+    table = permutation_table(block, support)
+    axes = qubit_axes(support)
+    src = qubit_view(state, n, support)
+    new_state = np.empty_like(state)
+    dst = qubit_view(new_state, n, support)
+
+    def pattern(p):
+        index = [slice(None)] * src.ndim
+        for j, axis in enumerate(axes):
+            index[axis] = (p >> (s - 1 - j)) & 1
+        return tuple(index)
+
+    def task(p):
+        dst[pattern(p)] = src[pattern(table[p])]
+
+    if _pool is None or n < PARALLEL_MIN_QUBITS:
+        for p in range(2 ** s):
+            task(p)
+    else:
+        run_blocks(task, 2 ** s)
+    return new_state
 
 
-def apply_controlled(state, control, target, n, gate_matrix):
-    dim = 2 ** n
+def apply_gate(state, gate, qubit, n):
+    return apply_matrix(state, gate, [qubit], n)
+
+
+def apply_multi_controlled(state, controls, target, n, gate_matrix):
+    # Apply gate_matrix to the target on the block where every control is 1;
+    # the rest of the state is left untouched.
+    controls = tuple(controls)
+    gate_matrix = np.asarray(gate_matrix, dtype=state.dtype)
+    split = split_qubits(n, controls + (target,))
+    if split:
+        # Each block copies itself, then updates its own control subspace
+        shape, indices, inner = block_layout(n, split, controls + (target,))
+        index = [slice(None)] * (len(shape) - len(split))
+        for axis in inner[:-1]:
+            index[axis] = 1
+        index = tuple(index)
+        t_axis = inner[-1] - sum(axis < inner[-1] for axis in inner[:-1])
+        src = state.reshape(shape)
+        new_state = np.empty_like(state)
+        dst = new_state.reshape(shape)
+
+        def task(b):
+            block = dst[indices[b]]
+            block[...] = src[indices[b]]
+            sub = block[index]
+            out = np.tensordot(gate_matrix, sub, axes=([1], [t_axis]))
+            sub[...] = np.moveaxis(out, 0, t_axis)
+
+        run_blocks(task, len(indices))
+        return new_state
+    index, t_axis = control_index(n, controls, target)
     new_state = np.copy(state)
-    for i in range(dim):
-        if ((i >> (n - 1 - control)) & 1) == 1:
-            flipped = i ^ (1 << (n - 1 - target))
-            new_state[flipped] += state[i]
-            new_state[i] -= state[i]
+    sub = qubit_view(new_state, n, controls + (target,))[index]
+    out = np.tensordot(gate_matrix, sub, axes=([1], [t_axis]))
+    sub[...] = np.moveaxis(out, 0, t_axis)
     return new_state
 
 
+def apply_controlled(state, control, target, n, gate_matrix):
+    return apply_multi_controlled(state, [control], target, n, gate_matrix)
+
+
 def apply_cx(state, control, target, n):
     return apply_controlled(state, control, target, n, GATES["x"])
 
@@ -51,47 +457,90 @@ def apply_cy(state, control, target, n):
 
 
 def apply_ccx(state, c1, c2, target, n):
-    dim = 2 ** n
-    new_state = np.copy(state)
-    for i in range(dim):
-        b = format(i, f'0{n}b')
-        if b[n - 1 - c1] == '1' and b[n - 1 - c2] == '1':
-            flipped = i ^ (1 << (n - 1 - target))
-            new_state[flipped] += state[i]
-            new_state[i] -= state[i]
-    return new_state
+    return apply_multi_controlled(state, [c1, c2], target, n, GATES["x"])
 
 
-def apply_swap(state, q1, q2, n):
-    dim = 2 ** n
-    new_state = np.zeros_like(state)
-    for i in range(dim):
-        b = list(format(i, f'0{n}b'))
-        b[n - 1 - q1], b[n - 1 - q2] = b[n - 1 - q2], b[n - 1 - q1]
-        j = int("".join(b), 2)
-        new_state[j] = state[i]
-    return new_state
+def apply_ccz(state, c1, c2, target, n):
+    return apply_multi_controlled(state, [c1, c2], target, n, GATES["z"])
 
 
-def measure(state, n, measured_qubits):
-    dim = 2 ** n
-    probs = np.abs(state) ** 2
-    outcomes = []
-    for _ in range(1024):
-        index = np.random.choice(dim, p=probs)
-        b = format(index, f'0{n}b')
-        outcome = ''.join(b[n - 1 - q] for q in measured_qubits)
-        outcomes.append(outcome)
-    return Counter(outcomes)
-
+def apply_swap(state, q1, q2, n):
+    view = qubit_view(state, n, [q1, q2])
+    a1, a2 = qubit_axes([q1, q2])
+    return np.swapaxes(view, a1, a2).reshape(-1)
+
+
+def materialize_layout(state, layout, n):
+    # layout[i] is the physical axis currently holding logical qubit i; a
+    # single transpose puts every logical qubit back on its own axis.
+    layout = list(layout)
+    if layout == list(range(n)):
+        return state
+    return state.reshape([2] * n).transpose(layout).reshape(-1)
+
+
+def bit_labels(values, m):
+    # m-bit binary strings for an integer array, built as one character
+    # matrix instead of one format() call per value.
+    shifts = np.arange(m - 1, -1, -1)
+    chars = ((np.asarray(values)[:, None] >> shifts) & 1).astype(np.uint8) + ord('0')
+    return chars.view(f'S{m}').ravel().astype(f'U{m}').tolist()
+
+
+def marginal_probabilities(state, n, qubits):
+    # Sum |amplitude|^2 over every unmeasured qubit; entry k of the result is
+    # the probability of reading the bits of k on `qubits`, first qubit first.
+    # float64 even for single-precision states, so the sampler sees a sum of 1
+    probs = qubit_view((np.abs(state) ** 2).astype(np.float64, copy=False), n, qubits)
+    marginal = probs.sum(axis=tuple(range(0, probs.ndim, 2)))
+    order = sorted(qubits)
+    marginal = marginal.transpose([order.index(q) for q in qubits]).reshape(-1)
+    return marginal / marginal.sum()
+
+
+def measure(state, n, measured_qubits, shots=1024, seed=None, exact=False):
+    # Sample from the 2^m marginal of the measured qubits in one multinomial
+    # call; with exact=True return the marginal probabilities themselves.
+    m = len(measured_qubits)
+    probs = marginal_probabilities(state, n, measured_qubits)
+    if exact:
+        keys = np.flatnonzero(probs)
+        return dict(zip(bit_labels(keys, m), probs[keys].tolist()))
+    hits = np.random.default_rng(seed).multinomial(shots, probs)
+    keys = np.flatnonzero(hits)
+    return Counter(dict(zip(bit_labels(keys, m), hits[keys].tolist())))
+
+
+def reduced_density_matrices(state, n):
+    # 2x2 reduced density matrix of every qubit, shape (n, 2, 2). Qubit q
+    # splits the state into (higher, q, lower) axes and one einsum traces the
+    # others out, so all n of them cost O(n 2^n).
+    conj = state.conj()
+    rhos = np.empty((n, 2, 2), dtype=np.complex128)
+    for q in range(n):
+        shape = (2 ** q, 2, 2 ** (n - 1 - q))
+        rhos[q] = np.einsum('aib,ajb->ij', state.reshape(shape), conj.reshape(shape))
+    return rhos / np.trace(rhos, axis1=1, axis2=2).real[:, None, None]
+
+
+def bloch_vectors(state, n):
+    # (x, y, z) of every qubit from its reduced density matrix; shorter than
+    # 1 when the qubit is entangled with the rest
+    rhos = reduced_density_matrices(state, n)
+    return np.stack([2 * rhos[:, 0, 1].real, -2 * rhos[:, 0, 1].imag,
+                     (rhos[:, 0, 0] - rhos[:, 1, 1]).real], axis=1)
+
+
+# Rendering. matplotlib is imported by these functions only, so computing
+# without plots never loads it.
 
 def display_bloch(qubit_state, qubit_name="q", show=True):
-    alpha, beta = qubit_state[0], qubit_state[1]
-    theta = 2 * np.arccos(np.abs(alpha))
-    phi = np.angle(beta) - np.angle(alpha)
-    x = np.sin(theta) * np.cos(phi)
-    y = np.sin(theta) * np.sin(phi)
-    z = np.cos(theta)
+    # qubit_state is a 2-amplitude state or an (x, y, z) Bloch vector
+    import matplotlib.pyplot as plt
+    qubit_state = np.asarray(qubit_state)
+    if len(qubit_state) == 2:
+        qubit_state = bloch_vectors(qubit_state.astype(complex), 1)[0]
+    x, y, z = qubit_state.real
 
     fig = plt.figure(figsize=(5, 5))
     ax = fig.add_subplot(111, projection='3d')
@@ -117,19 +566,11 @@ def display_bloch(qubit_state, qubit_name="q", show=True):
 
 
 def show_all_bloch_spheres(state, qubits):
-    n = len(qubits)
-    for i, q in enumerate(qubits):
-        reduced_state = np.zeros((2,), dtype=complex)
-        for j in range(2 ** n):
-            bin_str = format(j, f'0{n}b')
-            if all(bin_str[k] == '0' for k in range(n) if k != i):
-                reduced_state[int(bin_str[i])] = state[j]
-        norm = np.linalg.norm(reduced_state)
-        if norm > 0:
-            reduced_state /= norm
-            display_bloch(reduced_state, qubit_name=q)
+    for q, vector in zip(qubits, bloch_vectors(state, len(qubits))):
+        display_bloch(vector, qubit_name=q)
 
 def plot_statevector(state, qubit_labels):
+    import matplotlib.pyplot as plt
     n = len(qubit_labels)
     dim = 2 ** n
     fig, ax = plt.subplots(figsize=(12, 4))
@@ -146,95 +587,382 @@ def plot_statevector(state, qubit_labels):
     plt.savefig("statevector_plot.png")
     plt.show()
 
-def simulate(ir, save_hist="histogram.png", log_file="runtime_log.txt"):
-    logs = []
-    state_history = []
+def renormalize(state):
+    # Undo the norm drift that accumulates in single precision
+    return state / np.linalg.norm(state)
+
+
+def plot_histogram(result_counts, save_hist, shots, exact=False):
+    import matplotlib.pyplot as plt
+    keys, values = zip(*sorted(result_counts.items()))
+    plt.figure(figsize=(10, 4))
+    bars = plt.bar(keys, values, color='skyblue')
+    for bar, val in zip(bars, values):
+        plt.text(bar.get_x() + bar.get_width() / 2, val * 1.01,
+                 f"{val:.3f}" if exact else str(val),
+                 ha='center', va='bottom', fontsize=10)
+    plt.xlabel("Measurement Outcome", fontsize=12)
+    plt.ylabel("Probability" if exact else "Counts", fontsize=12)
+    plt.title("Measurement Probabilities (exact)" if exact
+              else f"Measurement Histogram ({shots} shots)")
+    plt.tight_layout()
+    plt.savefig(save_hist)
+    plt.show()
+
+
+def report_results(result_counts, logs, save_hist, log_file, shots, exact=False):
+    # Histogram unless save_hist is None (headless runs), then close the log
+    if result_counts and save_hist:
+        plot_histogram(result_counts, save_hist, shots, exact)
+        logs.append(f"Histogram saved to {save_hist}")
+
+    # The sink has been writing to log_file all along; just close it
+    logs.close()
+    if log_file:
+        print(f"✅ Runtime logs saved to {log_file}")
+
+
+def run_statevector(ir, logs, fuse=False, max_fused_width=2, dtype=np.complex128,
+                    renormalize_every=64, history=None):
+    # Evolve the dense statevector through the IR, logging to the LogSink
+    # `logs` (per-gate lines at debug level); returns the final state in
+    # logical qubit order, the measured qubits and the StateHistory the
+    # snapshots went to (policy "none" unless one is passed in). In reduced
+    # precision the state is renormalized every renormalize_every gates.
+    if history is None:
+        history = StateHistory("none")
     qubit_labels = ir["qubits"]
     n = len(qubit_labels)
+    # Logical qubit -> physical axis. SWAP only relabels this map, so no
+    # amplitudes move until the state is read out.
     qubit_index = {q: i for i, q in enumerate(qubit_labels)}
-    state = np.zeros((2 ** n,), dtype=complex)
+    logical_index = dict(qubit_index)
+    state = np.zeros((2 ** n,), dtype=dtype)
     state[0] = 1.0
     logs.append(f"Initialized state |{'0' * n}>")
-    state_history.append(state.copy())
 
     measured_qubits = []
 
-    for instr in ir["instructions"]:
+    instructions = ir["instructions"]
+    if fuse:
+        from optimizer import fuse_gates
+        instructions, saved = fuse_gates(instructions, max_width=max_fused_width)
+        logs.append(f"Gate fusion (width {max_fused_width}) saved {saved} statevector passes")
+
+    applied = 0  # gates since the last renormalization
+    phases = {}  # diagonal gates not yet multiplied into the state
+    perm_block = []  # X/CX/CCX/MCX gates not yet gathered into the state
+
+    def flush_permutations():
+        nonlocal state, perm_block
+        if len(perm_block) > 1:
+            logs.append(f"Applied {len(perm_block)} permutation gates in one gather")
+        state = apply_permutation(state, n, perm_block)
+        perm_block = []
+
+    def snapshot(label=None):
+        # Bring deferred work into the state, then record it in logical order
+        nonlocal state
+        if perm_block:
+            flush_permutations()
+        state = apply_phases(state, phases, n)
+        history.record(materialize_layout(state, [qubit_index[q] for q in qubit_labels], n),
+                       gates, label)
+
+    gates = 0  # gates so far, for the snapshot policy
+    due = history.wants_gate(0)  # snapshot owed for the gate just processed
+    for instr in split_single_qubit(instructions):
+        if due:
+            snapshot()
         op = instr["op"]
+        gate = is_gate(instr)
+        if gate or op == "swap":
+            gates += 1
+            due = history.wants_gate(gates)
+        else:
+            due = False
+
+        # Diagonal gates (Z, CZ, CCZ, diagonal fused blocks) only collect
+        # phases; they are applied once a non-diagonal gate touches them.
+        if gate:
+            applied += 1
+            if dtype != np.complex128 and applied % renormalize_every == 0:
+                state = renormalize(state)
+            qubits = [qubit_index[q] for q in instr["args"]]
+            # Consecutive basis permutations are composed and gathered once
+            if op in PERMUTATION_GATES:
+                state = apply_phases(state, phases, n, qubits)
+                perm_block.append(tuple(qubits))
+                logs.debug(f"Queued {op.upper()} on {', '.join(instr['args'])}")
+                continue
+            if perm_block:
+                flush_permutations()
+            diag = gate_diagonal(instr)
+            if diag is not None:
+                defer_phase(phases, qubits, diag)
+                logs.debug(f"Deferred {op.upper()} phase on {', '.join(instr['args'])}")
+                continue
+            state = apply_phases(state, phases, n, qubits)
 
         if op in GATES:
             for q in instr["args"]:
                 idx = qubit_index[q]
                 state = apply_gate(state, GATES[op], idx, n)
-                logs.append(f"Applied {op.upper()} to {q}")
-                state_history.append(state.copy())
+                logs.debug(f"Applied {op.upper()} to {q}")
         elif op == "cx":
             c, t = instr["args"]
             state = apply_cx(state, qubit_index[c], qubit_index[t], n)
-            logs.append(f"Applied CX to {c} → {t}")
-            state_history.append(state.copy())
+            logs.debug(f"Applied CX to {c} → {t}")
         elif op == "cz":
             c, t = instr["args"]
             state = apply_cz(state, qubit_index[c], qubit_index[t], n)
-            logs.append(f"Applied CZ to {c} → {t}")
-            state_history.append(state.copy())
+            logs.debug(f"Applied CZ to {c} → {t}")
         elif op == "cy":
             c, t = instr["args"]
             state = apply_cy(state, qubit_index[c], qubit_index[t], n)
-            logs.append(f"Applied CY to {c} → {t}")
-            state_history.append(state.copy())
-        elif op == "ccx":
-            c1, c2, t = instr["args"]
-            state = apply_ccx(state, qubit_index[c1], qubit_index[c2], qubit_index[t], n)
-            logs.append(f"Applied CCX to {c1}, {c2} → {t}")
-            state_history.append(state.copy())
+            logs.debug(f"Applied CY to {c} → {t}")
+        elif op in CONTROLLED_GATES:
+            *controls, t = instr["args"]
+            state = apply_multi_controlled(state, [qubit_index[c] for c in controls],
+                                           qubit_index[t], n, GATES[CONTROLLED_GATES[op]])
+            logs.debug(f"Applied {op.upper()} to {', '.join(controls)} → {t}")
+        elif op == "unitary":
+            targets = instr["args"]
+            state = apply_matrix(state, instr["matrix"], [qubit_index[q] for q in targets], n)
+            logs.debug(f"Applied fused unitary ({instr.get('fused', 1)} gates) to {', '.join(targets)}")
         elif op == "swap":
             q1, q2 = instr["args"]
-            state = apply_swap(state, qubit_index[q1], qubit_index[q2], n)
-            logs.append(f"Swapped {q1} and {q2}")
-            state_history.append(state.copy())
+            qubit_index[q1], qubit_index[q2] = qubit_index[q2], qubit_index[q1]
+            logs.debug(f"Swapped {q1} and {q2}")
         elif op == "measure":
-            measured_qubits = [qubit_index[q] for q in instr["qubits"]]
+            measured_qubits = [logical_index[q] for q in instr["qubits"]]
             logs.append(f"Scheduled measurement on {instr['qubits']}")
-
-    logs.append("Final Statevector:")
-    for i, amp in enumerate(state):
-        bin_label = format(i, f'0{n}b')
-        logs.append(f"|{bin_label}> : {amp.real:.4f} + {amp.imag:.4f}j")
-
-    # Bloch sphere and animation
-    show_all_bloch_spheres(state, qubit_labels)
-    # Plot the final statevector
-    plot_statevector(state, qubit_labels)
-    
-    if measured_qubits:
-        result_counts = measure(state, n, measured_qubits)
-        logs.append("Performed 1024-shot measurement.")
+        elif op == "barrier" and history.wants_barrier():
+            snapshot(instr.get("label", f"barrier after gate {gates}"))
+
+    if due:
+        snapshot()
+    if perm_block:
+        flush_permutations()
+    if phases:
+        state = apply_phases(state, phases, n)
+        logs.append("Applied deferred diagonal phases")
+    state = materialize_layout(state, [qubit_index[q] for q in qubit_labels], n)
+    if dtype != np.complex128:
+        state = renormalize(state)
+    if len(history):
+        logs.append(f"Kept {len(history)} snapshots ({history.nbytes()} bytes, policy "
+                    f"'{history.policy}'{', delta-compressed' if history.compress else ''})")
+    return state, measured_qubits, history
+
+
+def run_simulation(ir, shots=1024, seed=None, exact=False, fuse=False, max_fused_width=2,
+                   precision="double", renormalize_every=64, check_fidelity=False, history=None,
+                   logs=None, amplitudes="top", top_k=32):
+    # Dense statevector run with no rendering: returns the counts (or exact
+    # probabilities), the final state and a metrics dict. Logs go to `logs`
+    # if a LogSink is given.
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}'")
+    if logs is None:
+        logs = LogSink(level="quiet")
+    n = len(ir["qubits"])
+    start = time.perf_counter()
+    # Snapshots go to `history` (a history.StateHistory), which the caller
+    # keeps and reads afterwards; none are taken without one
+    state, measured_qubits, _ = run_statevector(
+        ir, logs, fuse, max_fused_width, PRECISIONS[precision], renormalize_every, history)
+    metrics = {"qubits": n, "precision": precision, "measured": len(measured_qubits),
+               "evolve_seconds": time.perf_counter() - start}
+    if check_fidelity and precision != "double":
+        reference, _, _ = run_statevector(ir, LogSink(level="quiet"), fuse, max_fused_width)
+        metrics["fidelity"] = abs(np.vdot(reference, state.astype(np.complex128))) ** 2
+        logs.append(f"Fidelity of {precision} precision against double: {metrics['fidelity']:.10f}")
+
+    if logs.enabled("info"):
+        log_amplitudes(logs, state, n, amplitudes, top_k)
+
+    if measured_qubits and exact:
+        result_counts = measure(state, n, measured_qubits, exact=True)
+        logs.append("Computed exact marginal probabilities.")
+    elif measured_qubits:
+        result_counts = measure(state, n, measured_qubits, shots=shots, seed=seed)
+        logs.append(f"Performed {shots}-shot measurement.")
     else:
         result_counts = Counter()
         logs.append("No measurement found. Skipping measurement step.")
+    metrics["seconds"] = time.perf_counter() - start
+    return result_counts, state, metrics
+
+
+# Backend runners: run(ir, logs, shots, seed, exact, **options) returns the
+# counts, the final dense statevector (None when the backend keeps none) and
+# an info dict. Their keyword arguments are the options each backend takes.
+
+def statevector_backend(ir, logs, shots, seed, exact, fuse=False, max_fused_width=2,
+                        precision="double", renormalize_every=64, check_fidelity=False,
+                        workers=None, history=None, amplitudes="top", top_k=32):
+    # workers sizes the kernel thread pool for this run only
+    with using_workers(workers):
+        return run_simulation(ir, shots, seed, exact, fuse, max_fused_width, precision,
+                              renormalize_every, check_fidelity, history, logs, amplitudes,
+                              top_k)
+
+
+def reversible_backend(ir, logs, shots, seed, exact):
+    # X/CX/CCX/MCX/SWAP programs never leave the basis: track one integer
+    from reversible import simulate_reversible
+    result_counts, final = simulate_reversible(ir, shots=shots, exact=exact)
+    n = len(ir["qubits"])
+    return result_counts, None, {"qubits": n, "final": format(final, f"0{n}b")}
+
+
+def stabilizer_backend(ir, logs, shots, seed, exact):
+    # Clifford-only programs can skip the dense statevector entirely
+    from stabilizer import simulate_stabilizer
+    result_counts, info = simulate_stabilizer(ir, shots=shots, seed=seed, exact=exact)
+    return result_counts, None, info
+
+
+def mps_backend(ir, logs, shots, seed, exact, max_bond=64, cutoff=1e-12):
+    # Low-entanglement programs (GHZ, linear chains) as a matrix product state
+    from mps import simulate_mps
+    result_counts, _, info = simulate_mps(ir, shots=shots, seed=seed, exact=exact,
+                                          max_bond=max_bond, cutoff=cutoff)
+    return result_counts, None, info
+
+
+def sparse_backend(ir, logs, shots, seed, exact, fill_threshold=0.25, amplitudes="top",
+                   top_k=32):
+    # Only the nonzero amplitudes, until more than fill_threshold are nonzero
+    from sparse import simulate_sparse
+    result_counts, state, info = simulate_sparse(ir, shots=shots, seed=seed, exact=exact,
+                                                 fill_threshold=fill_threshold)
+    if info["switched_at"] is not None:
+        logs.append(f"Switched to dense after instruction {info['switched_at']}")
+    log_amplitudes(logs, state.amps, state.n, amplitudes, top_k, state.indices)
+    return result_counts, None, info
+
+
+def memmap_backend(ir, logs, shots, seed, exact, memmap_path="statevector.dat",
+                   chunk_qubits=20, checkpoint_every=0, resume=False):
+    # Statevector in a memory-mapped file for runs that do not fit in RAM
+    from outofcore import simulate_out_of_core
+    result_counts, info = simulate_out_of_core(ir, memmap_path, shots=shots, seed=seed,
+                                               exact=exact, chunk_qubits=chunk_qubits,
+                                               checkpoint_every=checkpoint_every, resume=resume)
+    if info["resumed_at"] is not None:
+        logs.append(f"Resumed {memmap_path} at instruction {info['resumed_at']}")
+    return result_counts, None, dict(info, path=memmap_path)
+
+
+def processes_backend(ir, logs, shots, seed, exact, processes=4):
+    # One process per slice of the amplitudes, sharing the statevector
+    from procpool import simulate_processes
+    result_counts, info = simulate_processes(ir, workers=processes, shots=shots, seed=seed,
+                                             exact=exact)
+    return result_counts, None, info
+
+
+def distributed_backend(ir, logs, shots, seed, exact, shards=4, host="localhost",
+                        coordinator=None):
+    # Statevector sharded over worker processes talking over sockets
+    from distributed import simulate_distributed
+    result_counts, info = simulate_distributed(ir, shards=shards, host=host, shots=shots,
+                                               seed=seed, exact=exact, coordinator=coordinator)
+    return result_counts, None, info
+
+
+def blocked_backend(ir, logs, shots, seed, exact, tile_qubits=15):
+    # Runs of gates on the low qubits are applied one cache-sized tile at a time
+    from blocked import simulate_blocked
+    return simulate_blocked(ir, tile_qubits=tile_qubits, shots=shots, seed=seed, exact=exact)
+
+
+def inplace_backend(ir, logs, shots, seed, exact):
+    # Preallocated state plus one scratch buffer; reports the peak memory
+    from inplace import simulate_inplace
+    result_counts, state, info = simulate_inplace(ir, shots=shots, seed=seed, exact=exact)
+    return result_counts, state, dict(info, peak_mib=info["peak_bytes"] / 2 ** 20)
+
+
+# name -> (runner, summary line formatted with the runner's info dict)
+BACKENDS = {
+    "statevector": (statevector_backend,
+                    "Statevector backend on {qubits} qubits ({precision} precision), "
+                    "{seconds:.3f} s"),
+    "reversible": (reversible_backend, "Reversible fast path: final basis state |{final}>"),
+    "stabilizer": (stabilizer_backend,
+                   "Stabilizer backend ({mode}) on {qubits} qubits, registers {cregs}"),
+    "mps": (mps_backend,
+            "MPS backend on {qubits} qubits: max bond {max_bond}, "
+            "truncation error {truncation_error:.3e}"),
+    "sparse": (sparse_backend,
+               "Sparse backend on {qubits} qubits: peak {peak_nonzero} nonzero amplitudes"),
+    "memmap": (memmap_backend,
+               "Out-of-core backend on {qubits} qubits: {chunks} chunks in {path}"),
+    "processes": (processes_backend,
+                  "Process backend: {workers} workers, {gates} gates on {qubits} qubits, "
+                  "{repartitioned} repartitioned"),
+    "distributed": (distributed_backend,
+                    "Distributed backend: {shards} shards of {local_qubits} local qubits, "
+                    "{exchanges} exchanges, {bytes_sent} bytes sent"),
+    "blocked": (blocked_backend,
+                "Blocked backend: {gates} gates in {passes} passes over {tile_qubits}-qubit "
+                "tiles, {seconds:.3f} s, {bandwidth_gbs:.2f} GB/s memory traffic "
+                "({effective_gbs:.2f} GB/s effective)"),
+    "inplace": (inplace_backend,
+                "In-place backend: {gates} gates on {qubits} qubits, peak {peak_mib:.1f} MiB "
+                "({peak_states:.2f}× the state)"),
+}
 
-    if result_counts:
-        keys, values = zip(*sorted(result_counts.items()))
-        plt.figure(figsize=(10, 4))
-        bars = plt.bar(keys, values, color='skyblue')
-        for bar, val in zip(bars, values):
-            plt.text(bar.get_x() + bar.get_width() / 2, val + 5, str(val),
-                     ha='center', va='bottom', fontsize=10)
-        plt.xlabel("Measurement Outcome", fontsize=12)
-        plt.ylabel("Counts", fontsize=12)
-        plt.title("Measurement Histogram (1024 shots)")
-        plt.tight_layout()
-        plt.savefig(save_hist)
-        plt.show()
-        logs.append(f"Histogram saved to {save_hist}")
-
-    # Save logs to file
-    with open(log_file, "w", encoding="utf-8") as f:
-        f.write("\n".join(logs))
-    print(f"✅ Runtime logs saved to {log_file}")
 
-    return result_counts, logs
+def backend_options(runner):
+    # Keyword options a backend runner accepts
+    params = list(inspect.signature(runner).parameters)
+    return set(params[5:])
+
+
+def simulate(ir, save_hist="histogram.png", log_file="runtime_log.txt", shots=1024, seed=None,
+             exact=False, backend="auto", log_level="debug", log_tail=200, render=True,
+             **options):
+    # Run `ir` on one of BACKENDS; `options` go to that backend and any it
+    # does not take raise a ValueError. render=False skips every plot (and
+    # never imports matplotlib); for the state and metrics as well as the
+    # counts, call run_simulation directly.
+    if not render:
+        save_hist = None
+
+    # Reversible programs go to the integer path unless the run is rendered
+    # and the state fits, so the plots still appear, or it asks for options
+    # only the statevector takes
+    if backend == "auto":
+        from reversible import is_reversible
+        dense = render and len(ir["qubits"]) <= MAX_DENSE_QUBITS
+        reversible = not dense and not options and is_reversible(ir["instructions"])
+        backend = "reversible" if reversible else "statevector"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'")
+    runner, summary = BACKENDS[backend]
+    unsupported = set(options) - backend_options(runner)
+    if unsupported:
+        raise ValueError(f"Backend '{backend}' does not take {', '.join(sorted(unsupported))}")
+
+    logs = LogSink(log_file, log_level, log_tail)
+    result_counts, state, info = runner(ir, logs, shots, seed, exact, **options)
+    logs.append(summary.format(**info))
+
+    if render and state is not None:
+        qubit_labels = ir["qubits"]
+        # Bloch sphere and animation
+        show_all_bloch_spheres(state, qubit_labels)
+        # Plot the final statevector
+        plot_statevector(state, qubit_labels)
+    elif render:
+        logs.append(f"No statevector from the {backend} backend; Bloch and statevector plots skipped")
+
+    report_results(result_counts, logs, save_hist, log_file, shots, exact)
+    return result_counts, logs.tail()
 
 
 # Run on bell_ir.json if executed directly
@@ -3,6 +3,12 @@ import matplotlib.pyplot as plt
 from qiskit import QuantumCircuit, Aer, execute, transpile
 from qiskit.visualization import plot_histogram, plot_bloch_multivector
 from qiskit.quantum_info import Statevector
+from reversible import run_reversible
+
+
+# Above this many qubits the convert Bloch plot is skipped; the state itself
+# never needs a statevector
+MAX_BLOCH_QUBITS = 8
 
 
 def simulate_convert(value: int):
@@ -11,20 +17,26 @@ def simulate_convert(value: int):
     num_bits = len(binary_str)
     print(f"Decimal {value} → Binary {binary_str}")
 
-    qc = QuantumCircuit(num_bits, num_bits)
+    # q[i] holds bit i of the value (Qiskit order); the reversible path puts
+    # qubit 0 first, so q[i] sits at position num_bits - 1 - i
+    qubit_index = {f"q{i}": num_bits - 1 - i for i in range(num_bits)}
+    program = []
     for i, bit in enumerate(reversed(binary_str)):
         if bit == '1':
-            qc.x(i)
+            program.append({"op": "x", "args": [f"q{i}"]})
             print(f"Initializing q[{i}] to |1⟩")
         else:
             print(f"Initializing q[{i}] to |0⟩")
 
-    sv = Statevector.from_instruction(qc)
-    print("\n[STATEVECTOR]")
-    print(sv)
+    label = format(run_reversible(program, qubit_index), f'0{num_bits}b')
+    print("\n[BASIS STATE]")
+    print(f"|{label}⟩")
 
+    if num_bits > MAX_BLOCH_QUBITS:
+        print(f"[BLOCH] Skipped for {num_bits} qubits")
+        return
     try:
-        plot_bloch_multivector(sv)
+        plot_bloch_multivector(Statevector.from_label(label))
         plt.title("Bloch Spheres of Converted State")
         plt.show()
     except Exception as e:
@@ -64,6 +76,13 @@ def build_qiskit_circuit(ir):
                     getattr(qc, op)(qmap[args[0]], qmap[args[1]])
                 elif op == "ccx":
                     qc.ccx(qmap[args[0]], qmap[args[1]], qmap[args[2]])
+                elif op == "mcx":
+                    qc.mcx([qmap[q] for q in args[:-1]], qmap[args[-1]])
+                elif op in {"ccz", "mcz"}:
+                    target = qmap[args[-1]]
+                    qc.h(target)
+                    qc.mcx([qmap[q] for q in args[:-1]], target)
+                    qc.h(target)
                 elif op == "barrier":
                     qc.barrier(*[qmap[q] for q in args])
                 elif op == "measure":
@@ -0,0 +1,161 @@
+import json
+import numpy as np
+from collections import Counter
+from simulation import (PERMUTATION_GATES, split_single_qubit, is_gate, split_controls, diagonal_of,
+                        apply_matrix, apply_multi_controlled, apply_swap, bit_labels, measure)
+
+
+class SparseState:
+    """Statevector stored as its nonzero amplitudes only.
+
+    ``indices`` holds basis indices (qubit 0 is the most significant bit, as
+    in simulation.py) and ``amps`` the matching amplitudes, so memory grows
+    with the number of nonzero amplitudes instead of 2^n. Amplitudes whose
+    magnitude falls below ``tol`` are dropped.
+    """
+
+    def __init__(self, n, tol=1e-12):
+        if n > 62:
+            raise ValueError("The sparse backend keys basis states by int64, so at most 62 qubits")
+        self.n = n
+        self.tol = tol
+        self.indices = np.zeros(1, dtype=np.int64)
+        self.amps = np.ones(1, dtype=complex)
+
+    @classmethod
+    def from_dense(cls, state, n, tol=1e-12):
+        sparse = cls(n, tol)
+        sparse.indices = np.flatnonzero(np.abs(state) > tol)
+        sparse.amps = state[sparse.indices]
+        return sparse
+
+    def to_dense(self):
+        state = np.zeros(2 ** self.n, dtype=complex)
+        state[self.indices] = self.amps
+        return state
+
+    def fill_ratio(self):
+        return len(self.indices) / 2 ** self.n
+
+    def mask(self, qubit):
+        return 1 << (self.n - 1 - qubit)
+
+    def bits(self, qubits):
+        # Sub-index of every stored basis state on `qubits`, first qubit first
+        sub = np.zeros_like(self.indices)
+        for q in qubits:
+            sub = (sub << 1) | ((self.indices >> (self.n - 1 - q)) & 1)
+        return sub
+
+    def apply(self, op, controls, matrix, targets):
+        # `matrix` acts on `targets` wherever every control is 1 (the form
+        # outofcore.split_controls gives), so wide controlled gates never
+        # need their full matrix. X-type gates move amplitudes, diagonal
+        # gates rescale them; only the general case can create new entries.
+        cmask = sum(self.mask(c) for c in controls)
+        hit = (self.indices & cmask) == cmask
+        if op in PERMUTATION_GATES:
+            self.indices = self.indices ^ (hit * self.mask(targets[0]))
+            return
+        matrix = np.asarray(matrix)
+        diag = diagonal_of(matrix)
+        if diag is not None:
+            self.amps = np.where(hit, self.amps * diag[self.bits(targets)], self.amps)
+            return
+        # Row r of the matrix writes the bits of r onto the target qubits;
+        # entries with a control at 0 are carried over unchanged
+        k = len(targets)
+        rows = np.arange(2 ** k)
+        offsets = np.zeros(2 ** k, dtype=np.int64)
+        for j, q in enumerate(targets):
+            offsets |= ((rows >> (k - 1 - j)) & 1) * self.mask(q)
+        base = self.indices[hit] & ~sum(self.mask(q) for q in targets)
+        indices = (base[:, None] | offsets[None, :]).reshape(-1)
+        amps = (matrix[:, self.bits(targets)[hit]].T * self.amps[hit][:, None]).reshape(-1)
+        self.compact(np.concatenate([self.indices[~hit], indices]),
+                     np.concatenate([self.amps[~hit], amps]))
+
+    def compact(self, indices, amps):
+        # Sum amplitudes landing on the same basis state and drop the zeros
+        keep = np.abs(amps) > self.tol
+        indices, amps = indices[keep], amps[keep]
+        unique, inverse = np.unique(indices, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        total = (np.bincount(inverse, weights=amps.real, minlength=len(unique))
+                 + 1j * np.bincount(inverse, weights=amps.imag, minlength=len(unique)))
+        keep = np.abs(total) > self.tol
+        self.indices, self.amps = unique[keep], total[keep]
+
+    def swap(self, q1, q2):
+        m1, m2 = self.mask(q1), self.mask(q2)
+        differ = ((self.indices & m1) != 0) != ((self.indices & m2) != 0)
+        self.indices = self.indices ^ (differ * (m1 | m2))
+
+    def measure(self, qubits, shots=1024, seed=None, exact=False):
+        # Same contract as simulation.measure, over the nonzero entries only
+        keys, inverse = np.unique(self.bits(qubits), return_inverse=True)
+        probs = np.bincount(inverse.reshape(-1), weights=np.abs(self.amps) ** 2)
+        probs = probs / probs.sum()
+        m = len(qubits)
+        if exact:
+            return dict(zip(bit_labels(keys, m), probs.tolist()))
+        hits = np.random.default_rng(seed).multinomial(shots, probs)
+        nonzero = np.flatnonzero(hits)
+        return Counter(dict(zip(bit_labels(keys[nonzero], m), hits[nonzero].tolist())))
+
+
+def simulate_sparse(ir, shots=1024, seed=None, exact=False, fill_threshold=0.25):
+    # Run the IR on a SparseState, switching to a dense vector once more than
+    # fill_threshold of the 2^n amplitudes are nonzero. Returns the counts,
+    # the final state (as a SparseState) and a small info dict.
+    qubit_index = {q: i for i, q in enumerate(ir["qubits"])}
+    n = len(qubit_index)
+    state = SparseState(n)
+    dense = None
+    measured = []
+    info = {"qubits": n, "peak_nonzero": 1, "switched_at": None}
+
+    for step, instr in enumerate(split_single_qubit(ir["instructions"])):
+        op = instr["op"]
+        if is_gate(instr):
+            controls, matrix, targets = split_controls(instr)
+            controls = [qubit_index[q] for q in controls]
+            targets = [qubit_index[q] for q in targets]
+            if dense is None:
+                state.apply(op, controls, matrix, targets)
+                info["peak_nonzero"] = max(info["peak_nonzero"], len(state.indices))
+                if state.fill_ratio() > fill_threshold:
+                    dense = state.to_dense()
+                    info["switched_at"] = step
+            elif controls:
+                dense = apply_multi_controlled(dense, controls, targets[0], n, matrix)
+            else:
+                dense = apply_matrix(dense, matrix, targets, n)
+        elif op == "swap":
+            qubits = [qubit_index[q] for q in instr["args"]]
+            if dense is None:
+                state.swap(*qubits)
+            else:
+                dense = apply_swap(dense, *qubits, n)
+        elif op == "measure":
+            measured = [qubit_index[q] for q in instr["qubits"]]
+
+    if dense is not None:
+        state = SparseState.from_dense(dense, n)
+    order = np.argsort(state.indices)
+    state.indices, state.amps = state.indices[order], state.amps[order]
+    if not measured:
+        result_counts = Counter()
+    elif dense is not None:
+        result_counts = measure(dense, n, measured, shots=shots, seed=seed, exact=exact)
+    else:
+        result_counts = state.measure(measured, shots=shots, seed=seed, exact=exact)
+    return result_counts, state, info
+
+
+if __name__ == "__main__":
+    with open("ghz_ir.json") as f:
+        ir = json.load(f)
+    counts, state, info = simulate_sparse(ir)
+    print(f"✅ Sparse run on {info['qubits']} qubits, peak {info['peak_nonzero']} nonzero amplitudes")
+    print(counts)
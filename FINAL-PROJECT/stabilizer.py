@@ -0,0 +1,320 @@
+import json
+import numpy as np
+from collections import Counter
+
+# Gates the tableau can apply; everything in the QuCPL grammar except ccx
+CLIFFORD_GATES = {"h", "x", "y", "z", "i", "cx", "cy", "cz", "swap"}
+PAULI_GATES = {"x", "y", "z", "i"}
+
+
+def popcount(words):
+    # Set bits per row of a uint64 word matrix
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return np.unpackbits(words.view(np.uint8), axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+def g_sum(x1, z1, x2, z2):
+    # Sum over qubits of the CHP phase exponent g for multiplying Pauli rows
+    # (x1, z1) into (x2, z2), on bit-packed words; broadcasts over rows.
+    pos = (x1 & z1 & ~x2 & z2) | (x1 & ~z1 & x2 & z2) | (~x1 & z1 & x2 & ~z2)
+    neg = (x1 & z1 & x2 & ~z2) | (x1 & ~z1 & ~x2 & z2) | (~x1 & z1 & x2 & z2)
+    return popcount(pos) - popcount(neg)
+
+
+class Tableau:
+    """Aaronson-Gottesman (CHP) tableau with symbolic measurement outcomes.
+
+    The X and Z parts are bit-packed, 64 qubits per uint64 word. Row phases
+    are affine forms over GF(2): column 0 of ``r`` is the constant bit and
+    column k > 0 is the k-th random measurement outcome, so a single pass
+    yields every outcome as a function of independent coin flips. With an
+    ``rng`` random outcomes are drawn immediately instead (one trajectory).
+    """
+
+    def __init__(self, n, max_vars=0, rng=None):
+        self.n = n
+        self.rng = rng
+        words = (n + 63) // 64
+        self.x = np.zeros((2 * n + 1, words), dtype=np.uint64)
+        self.z = np.zeros((2 * n + 1, words), dtype=np.uint64)
+        self.r = np.zeros((2 * n + 1, max_vars + 1), dtype=bool)
+        qubits = np.arange(n)
+        bits = np.left_shift(np.uint64(1), (qubits & 63).astype(np.uint64))
+        self.x[qubits, qubits >> 6] = bits
+        self.z[qubits + n, qubits >> 6] = bits
+        self.num_vars = 0
+
+    def col(self, m, a):
+        return ((m[:, a >> 6] >> np.uint64(a & 63)) & np.uint64(1)).astype(bool)
+
+    def flip(self, m, a, bits):
+        m[:, a >> 6] ^= bits.astype(np.uint64) << np.uint64(a & 63)
+
+    # --- Clifford gates -------------------------------------------------
+    def h(self, a):
+        xa, za = self.col(self.x, a), self.col(self.z, a)
+        self.r[:, 0] ^= xa & za
+        self.flip(self.x, a, xa ^ za)
+        self.flip(self.z, a, xa ^ za)
+
+    def s(self, a):
+        xa, za = self.col(self.x, a), self.col(self.z, a)
+        self.r[:, 0] ^= xa & za
+        self.flip(self.z, a, xa)
+
+    def cx(self, a, b):
+        xa, za = self.col(self.x, a), self.col(self.z, a)
+        xb, zb = self.col(self.x, b), self.col(self.z, b)
+        self.r[:, 0] ^= xa & zb & ~(xb ^ za)
+        self.flip(self.x, b, xa)
+        self.flip(self.z, a, zb)
+
+    def pauli(self, op, a, form=None):
+        # X flips rows with a Z component on a, Z rows with an X component,
+        # Y rows with exactly one of them. `form` makes the flip conditional.
+        xa, za = self.col(self.x, a), self.col(self.z, a)
+        flip = {"x": za, "z": xa, "y": xa ^ za, "i": np.zeros_like(xa)}[op]
+        if form is None:
+            self.r[:, 0] ^= flip
+        else:
+            self.r ^= np.outer(flip, form)
+
+    def swap(self, a, b):
+        for m in (self.x, self.z):
+            diff = self.col(m, a) ^ self.col(m, b)
+            self.flip(m, a, diff)
+            self.flip(m, b, diff)
+
+    def apply(self, op, qubits):
+        if op in PAULI_GATES:
+            self.pauli(op, qubits[0])
+        elif op == "h":
+            self.h(qubits[0])
+        elif op == "cx":
+            self.cx(*qubits)
+        elif op == "cz":
+            self.h(qubits[1])
+            self.cx(*qubits)
+            self.h(qubits[1])
+        elif op == "cy":
+            # CY = S_t . CX . S_t^dagger, and S^dagger = Z S
+            self.pauli("z", qubits[1])
+            self.s(qubits[1])
+            self.cx(*qubits)
+            self.s(qubits[1])
+        elif op == "swap":
+            self.swap(*qubits)
+        else:
+            raise ValueError(f"Gate '{op}' is not Clifford")
+
+    # --- Measurement ----------------------------------------------------
+    def new_var(self):
+        form = np.zeros(self.r.shape[1], dtype=bool)
+        if self.rng is not None:
+            form[0] = self.rng.integers(0, 2)
+            return form
+        self.num_vars += 1
+        if self.num_vars >= self.r.shape[1]:
+            self.r = np.hstack([self.r, np.zeros_like(self.r)])
+            form = np.zeros(self.r.shape[1], dtype=bool)
+        form[self.num_vars] = True
+        return form
+
+    def measure(self, a):
+        # Z-basis measurement of qubit a; returns the outcome as an affine form
+        n = self.n
+        xa = self.col(self.x, a)
+        candidates = np.flatnonzero(xa[n:2 * n])
+        if len(candidates):
+            p = n + candidates[0]
+            rows = np.flatnonzero(xa[:2 * n])
+            rows = rows[rows != p]
+            gbit = g_sum(self.x[p], self.z[p], self.x[rows], self.z[rows]) % 4 == 2
+            width = self.num_vars + 1
+            self.r[rows, :width] ^= self.r[p, :width]
+            self.r[rows, 0] ^= gbit
+            self.x[rows] ^= self.x[p]
+            self.z[rows] ^= self.z[p]
+            self.x[p - n], self.z[p - n], self.r[p - n] = self.x[p], self.z[p], self.r[p]
+            self.x[p] = 0
+            self.z[p] = 0
+            self.flip(self.z[p:p + 1], a, np.ones(1, dtype=bool))
+            self.r[p] = self.new_var()
+            return self.r[p].copy()
+
+        # Deterministic: the outcome is the phase of the product of the
+        # stabilizers whose destabilizer anticommutes with Z_a. The product is
+        # accumulated with prefix XORs instead of one rowsum per row.
+        rows = n + np.flatnonzero(xa[:n])
+        xs, zs = self.x[rows], self.z[rows]
+        zero = np.zeros((1, xs.shape[1]), dtype=np.uint64)
+        acc_x = np.vstack([zero, np.bitwise_xor.accumulate(xs)[:-1]])
+        acc_z = np.vstack([zero, np.bitwise_xor.accumulate(zs)[:-1]])
+        gbits = g_sum(xs, zs, acc_x, acc_z) % 4 == 2
+        form = np.zeros(self.r.shape[1], dtype=bool)
+        form[:self.num_vars + 1] = np.bitwise_xor.reduce(self.r[rows, :self.num_vars + 1], axis=0)
+        form[0] ^= np.bitwise_xor.reduce(gbits)
+        return form
+
+
+def resolve_ir(ir):
+    # Accept both IR dialects: FINAL-PROJECT (qubit names, "op"/"args") and
+    # teleportation/compiler.py (qubit count, "gate"/"qubits" indices).
+    if isinstance(ir["qubits"], list):
+        qmap = {q: i for i, q in enumerate(ir["qubits"])}
+        return len(qmap), ir["instructions"], qmap
+    return ir["qubits"], ir["oper"], None
+
+
+def normalize(instr, qmap):
+    # (kind, op, qubits, cregs / condition) for one instruction of either dialect
+    if instr.get("type") == "if":
+        cond = instr["condition"]
+        return "if", None, [], (cond["var"], cond["value"], instr.get("then", []), instr.get("else") or [])
+    op = instr.get("op", instr.get("gate"))
+    if op == "if":
+        return "if", None, [], (instr["creg"], instr["val"], instr.get("body", []), instr.get("else") or [])
+    if op == "measure":
+        qubits = instr["qubits"]
+        cregs = instr.get("classical", instr.get("cregs"))
+    else:
+        qubits = instr.get("args", instr.get("qubits", [])) if qmap is not None else instr.get("qubits", [])
+        cregs = None
+    if qmap is not None:
+        qubits = [qmap[q] for q in qubits if q in qmap]
+    return "op", op, qubits, cregs
+
+
+def count_measurements(block):
+    total = 0
+    for instr in block:
+        if instr.get("type") == "if" or instr.get("gate") == "if":
+            body = instr.get("then", instr.get("body", []))
+            total += max(count_measurements(body), count_measurements(instr.get("else") or []))
+        elif instr.get("op", instr.get("gate")) == "measure":
+            total += len(instr["qubits"])
+    return total
+
+
+def needs_trajectories(block):
+    # Conditional Pauli corrections stay symbolic; any other gate under an if
+    # forces one concrete run per shot.
+    for instr in block:
+        if instr.get("type") == "if" or instr.get("gate") == "if":
+            for sub in instr.get("then", instr.get("body", [])) + (instr.get("else") or []):
+                op = sub.get("op", sub.get("gate"))
+                if op not in PAULI_GATES | {"barrier", "print"} or needs_trajectories([sub]):
+                    return True
+    return False
+
+
+def pad(form, width):
+    out = np.zeros(width, dtype=bool)
+    out[:len(form)] = form
+    return out
+
+
+def run_program(ir, rng=None):
+    # One pass over the IR; returns the outcome form of every classical
+    # register (in order of first measurement) and the final tableau.
+    n, instructions, qmap = resolve_ir(ir)
+    tab = Tableau(n, count_measurements(instructions), rng)
+    cregs = {}
+
+    def execute_block(block, guard=None):
+        for instr in block:
+            kind, op, qubits, extra = normalize(instr, qmap)
+            if kind == "if":
+                if guard is not None:
+                    raise ValueError("Nested if blocks are not supported by the stabilizer backend")
+                var, val, then_block, else_block = extra
+                form = pad(cregs.get(var, []), tab.r.shape[1])
+                form[0] ^= not val
+                if not form[1:].any():
+                    execute_block(then_block if form[0] else else_block)
+                else:
+                    # Random condition: Pauli bodies are applied with the
+                    # condition folded into the row phases
+                    execute_block(then_block, guard=form)
+                    inverse = form.copy()
+                    inverse[0] ^= True
+                    execute_block(else_block, guard=inverse)
+            elif op in PAULI_GATES | {"h"}:
+                # Single-qubit ops may list several qubits ("h q0, q1")
+                for q in qubits:
+                    if guard is not None:
+                        tab.pauli(op, q, form=pad(guard, tab.r.shape[1]))
+                    else:
+                        tab.apply(op, [q])
+            elif op in CLIFFORD_GATES:
+                tab.apply(op, qubits)
+            elif op == "measure":
+                for q, c in zip(qubits, extra):
+                    cregs[c] = tab.measure(q)
+            elif op in {"barrier", "print", "convert"}:
+                continue
+            else:
+                raise ValueError(f"Gate '{op}' is not supported by the stabilizer backend")
+
+    execute_block(instructions)
+    return {c: pad(form, tab.r.shape[1]) for c, form in cregs.items()}, tab
+
+
+def evaluate_forms(forms, assignments):
+    # Outcome bits (rows = assignments, columns = registers) of affine forms;
+    # the GF(2) product goes through a float matmul, exact for these sizes.
+    matrix = np.array(list(forms.values()), dtype=bool).reshape(len(forms), -1)
+    k = assignments.shape[1]
+    sums = assignments.astype(np.float64) @ matrix[:, 1:k + 1].T.astype(np.float64)
+    return ((sums.astype(np.int64) & 1) ^ matrix[:, 0]).astype(np.uint8)
+
+
+def row_labels(bits):
+    # Bit-string label for each row of a 0/1 matrix
+    m = bits.shape[1]
+    return (bits + ord('0')).astype(np.uint8).view(f'S{m}').ravel().astype(f'U{m}').tolist()
+
+
+def simulate_stabilizer(ir, shots=1024, seed=None, exact=False):
+    # Counts keyed by the classical registers in order of first measurement,
+    # plus a small info dict. exact=True enumerates the uniform outcome space.
+    rng = np.random.default_rng(seed)
+    n, instructions, _ = resolve_ir(ir)
+
+    if needs_trajectories(instructions):
+        if exact:
+            raise ValueError("Exact mode needs a program without conditional non-Pauli gates")
+        rows = []
+        for _ in range(shots):
+            forms, _ = run_program(ir, rng)
+            rows.append(evaluate_forms(forms, np.zeros((1, 0), dtype=np.uint8))[0])
+        bits = np.array(rows, dtype=np.uint8).reshape(shots, len(forms))
+        mode = "trajectories"
+    else:
+        forms, tab = run_program(ir)
+        k = tab.num_vars
+        if exact:
+            if k > 20:
+                raise ValueError(f"Exact mode would enumerate 2^{k} outcomes")
+            assignments = (np.arange(2 ** k)[:, None] >> np.arange(k)) & 1
+        else:
+            assignments = rng.integers(0, 2, size=(shots, k))
+        bits = evaluate_forms(forms, assignments)
+        mode = "symbolic"
+
+    info = {"qubits": n, "cregs": list(forms), "mode": mode}
+    if not forms:
+        return Counter(), info
+    keys, counts = np.unique(bits, axis=0, return_counts=True)
+    if exact:
+        return dict(zip(row_labels(keys), (counts / counts.sum()).tolist())), info
+    return Counter(dict(zip(row_labels(keys), counts.tolist()))), info
+
+
+if __name__ == "__main__":
+    with open("tele_ir.json") as f:
+        ir = json.load(f)
+    counts, info = simulate_stabilizer(ir)
+    print(f"✅ {info['mode']} stabilizer run on {info['qubits']} qubits, registers {info['cregs']}")
+    print(counts)
@@ -0,0 +1,73 @@
+import os
+import random
+import numpy as np
+from outofcore import OutOfCoreState, simulate_out_of_core, sidecar_path, checkpoint_path
+from simulation import run_simulation
+
+OPS = ["h", "x", "y", "z", "cx", "cz", "ccx", "swap"]
+
+
+def random_program(n, length, rnd):
+    names = [f"q{i}" for i in range(n)]
+    instructions = []
+    for _ in range(length):
+        op = rnd.choice(OPS)
+        width = 3 if op == "ccx" else 2 if op in {"cx", "cz", "swap"} else 1
+        instructions.append({"op": op, "args": rnd.sample(names, width)})
+    instructions.append({"op": "measure", "qubits": names, "classical": names})
+    return {"qubits": names, "instructions": instructions}
+
+
+def assert_same(counts, expected):
+    # Exact probabilities; a pattern missing on one side must be ~0 on the other
+    for key in set(counts) | set(expected):
+        assert np.isclose(counts.get(key, 0.0), expected.get(key, 0.0))
+
+
+def test_resume_after_interrupt_matches_uninterrupted_run(tmp_path, monkeypatch):
+    # Interrupt a checkpointed run part way through a gate, possibly after
+    # it has half-written the file, then resume from the checkpoint
+    rnd = random.Random(16)
+    apply = OutOfCoreState.apply
+    for trial in range(20):
+        ir = random_program(rnd.randint(3, 5), rnd.randint(10, 30), rnd)
+        expected, _, _ = run_simulation(ir, exact=True)
+        path = str(tmp_path / f"state{trial}.dat")
+        stop, scribble = rnd.randint(5, 10), rnd.random() < 0.5
+        calls = [0]
+
+        def flaky(self, *args, **kwargs):
+            calls[0] += 1
+            if calls[0] == stop:
+                if scribble:
+                    self.amps[:len(self.amps) // 2] *= -1j
+                raise KeyboardInterrupt
+            return apply(self, *args, **kwargs)
+
+        monkeypatch.setattr(OutOfCoreState, "apply", flaky)
+        try:
+            simulate_out_of_core(ir, path, exact=True, chunk_qubits=1, checkpoint_every=4)
+        except KeyboardInterrupt:
+            pass
+        monkeypatch.setattr(OutOfCoreState, "apply", apply)
+        counts, info = simulate_out_of_core(ir, path, exact=True, chunk_qubits=1,
+                                            checkpoint_every=4, resume=True)
+        assert info["resumed_at"] is not None
+        assert_same(counts, expected)
+
+
+def test_finished_run_leaves_no_checkpoints(tmp_path):
+    ir = random_program(4, 20, random.Random(1))
+    path = str(tmp_path / "state.dat")
+    simulate_out_of_core(ir, path, exact=True, chunk_qubits=2, checkpoint_every=4)
+    for leftover in (sidecar_path(path), checkpoint_path(path, 0), checkpoint_path(path, 1)):
+        assert not os.path.exists(leftover)
+
+
+def test_resume_without_checkpoint_starts_fresh(tmp_path):
+    ir = random_program(4, 12, random.Random(2))
+    expected, _, _ = run_simulation(ir, exact=True)
+    counts, info = simulate_out_of_core(ir, str(tmp_path / "state.dat"), exact=True,
+                                        chunk_qubits=2, resume=True)
+    assert info["resumed_at"] is None
+    assert_same(counts, expected)
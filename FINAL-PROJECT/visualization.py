@@ -11,6 +11,9 @@ GATE_DISPLAY = {
     "cx": "CX",
     "cz": "CZ",
     "ccx": "CCX",
+    "ccz": "CCZ",
+    "mcx": "MCX",
+    "mcz": "MCZ",
     "swap": "SWAP",
     "cy": "CY",
     "measure": "M"
@@ -24,6 +27,9 @@ GATE_COLORS = {
     "cx": "#9467bd",     # Purple
     "cz": "#8c564b",     # Brown
     "ccx": "#17becf",    # Cyan
+    "ccz": "#bcbd22",    # Olive
+    "mcx": "#17becf",    # Cyan
+    "mcz": "#bcbd22",    # Olive
     "swap": "#e377c2",   # Pink
     "cy": "#7f7f7f",     # Gray
     "measure": "#ffbb78" # Light orange
@@ -81,17 +87,18 @@ def draw_circuit(ir, save_path=None):
             ax.text(gate_col, y2, "X", color='white', ha='center', va='center',
                     fontsize=font_size, fontweight='bold')
             ax.vlines(gate_col, min(y1, y2), max(y1, y2), color='black', linestyle='-')
-        elif op == "ccx" and len(args) == 3:
-            ctrl1, ctrl2, tgt = args
-            y1, y2, y3 = qubit_idx[ctrl1], qubit_idx[ctrl2], qubit_idx[tgt]
-            ax.plot(gate_col, y1, 'ko', markersize=6)
-            ax.plot(gate_col, y2, 'ko', markersize=6)
-            ax.add_patch(Rectangle((gate_col - gate_box_size/2, y3 - gate_box_size/2),
+        elif op in {"ccx", "ccz", "mcx", "mcz"} and len(args) >= 2:
+            *ctrls, tgt = args
+            ys = [qubit_idx[c] for c in ctrls]
+            y_t = qubit_idx[tgt]
+            for y in ys:
+                ax.plot(gate_col, y, 'ko', markersize=6)
+            ax.add_patch(Rectangle((gate_col - gate_box_size/2, y_t - gate_box_size/2),
                                    gate_box_size, gate_box_size,
                                    color=color, edgecolor='black', linewidth=1.5))
-            ax.text(gate_col, y3, "X", color='white', ha='center', va='center',
+            ax.text(gate_col, y_t, op[-1].upper(), color='white', ha='center', va='center',
                     fontsize=font_size, fontweight='bold')
-            ax.vlines(gate_col, min(y1, y3), max(y2, y3), color='black', linestyle='-')
+            ax.vlines(gate_col, min(ys + [y_t]), max(ys + [y_t]), color='black', linestyle='-')
         else:
             for q in args:
                 y = qubit_idx[q]
@@ -0,0 +1,127 @@
+import sys
+import json
+import argparse
+import numpy as np
+
+# Headless batch conversion. Only numpy is needed: parser.py reads
+# grammar.lark at import time and simulation.py builds Qiskit objects, so
+# neither is imported here.
+
+WORD_BITS = 63  # values below 2^63 take the vectorized path
+
+
+def bit_matrix(values):
+    # (len(values), 63) 0/1 matrix, column i = bit i (least significant first)
+    return ((values[:, None] >> np.arange(WORD_BITS, dtype=np.int64)) & 1).astype(np.uint8)
+
+
+def convert_chunk(values):
+    # One record per value: binary string, the same IR as compile_ast_to_ir
+    # and a basis-state summary. Bits, lengths and set positions come from one
+    # bit matrix; only the final dicts are built per item.
+    values = np.asarray(values, dtype=np.int64)
+    bits = bit_matrix(values)
+    lengths = np.maximum(WORD_BITS - np.argmax(bits[:, ::-1], axis=1), 1)
+    lengths[~bits.any(axis=1)] = 1
+
+    # Binary strings: the MSB-first character matrix, cut to each length
+    chars = (bits[:, ::-1] + ord('0')).view(f'S{WORD_BITS}').ravel()
+    binaries = [c[WORD_BITS - n:].decode() for c, n in zip(chars.tolist(), lengths.tolist())]
+
+    # Set bit positions of every value in one flat list (row-major, so each
+    # value's targets are contiguous and ascending). Every record gets its own
+    # instruction dicts, so editing one IR never changes another.
+    rows, targets = np.nonzero(bits)
+    instructions = [{"gate": "x", "target": i} for i in targets.tolist()]
+    ends = np.cumsum(np.bincount(rows, minlength=len(values))).tolist()
+
+    records = []
+    start = 0
+    for value, binary, n, end in zip(values.tolist(), binaries, lengths.tolist(), ends):
+        records.append({
+            "decimal": value,
+            "binary": binary,
+            "ir": {
+                "type": "program",
+                "decimal": value,
+                "binary": binary,
+                "instructions": instructions[start:end],
+            },
+            "summary": {"state": f"|{binary}⟩", "qubits": n, "ones": end - start},
+        })
+        start = end
+    return records
+
+
+def convert_big(value):
+    # Fallback for values that do not fit in an int64
+    binary = bin(value)[2:]
+    targets = [i for i, b in enumerate(reversed(binary)) if b == '1']
+    return {
+        "decimal": value,
+        "binary": binary,
+        "ir": {
+            "type": "program",
+            "decimal": value,
+            "binary": binary,
+            "instructions": [{"gate": "x", "target": i} for i in targets],
+        },
+        "summary": {"state": f"|{binary}⟩", "qubits": len(binary), "ones": len(targets)},
+    }
+
+
+def convert_batch(values):
+    values = [int(v) for v in values]
+    if any(v < 0 for v in values):
+        raise ValueError("convert only accepts non-negative integers")
+    small = [v for v in values if v < 2 ** WORD_BITS]
+    if len(small) == len(values):
+        return convert_chunk(small)
+    # Mixed widths: keep the input order
+    fast = iter(convert_chunk(small)) if small else iter(())
+    return [next(fast) if v < 2 ** WORD_BITS else convert_big(v) for v in values]
+
+
+def iter_convert(values, chunk_size=65536):
+    # Stream records for any iterable of integers, chunk_size at a time
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) == chunk_size:
+            yield from convert_batch(chunk)
+            chunk = []
+    if chunk:
+        yield from convert_batch(chunk)
+
+
+def read_values(stream):
+    # Integers separated by whitespace or newlines; blank lines are skipped
+    for line in stream:
+        for token in line.split():
+            yield int(token)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert integers to basis-state programs in bulk")
+    parser.add_argument("input", nargs="?", default="-", help="File of integers, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSON Lines output file, or - for stdout")
+    parser.add_argument("--no-ir", action="store_true", help="Leave the IR out of each record")
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for record in iter_convert(read_values(source), args.chunk_size):
+            if args.no_ir:
+                del record["ir"]
+            sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -95,19 +95,11 @@ def run_converter():
         command = f"convert {entry.get()}"
         ast = parse_code(command)
         ir = compile_ast_to_ir(ast)
-        qc, state = simulate_ir(ir)
+        qc, label, state = simulate_ir(ir)
 
-        # Display binary and statevector
+        # Display binary and the basis state (its only non-zero amplitude)
         binary_str.set(f"Binary: {ir['binary']}")
-        # Format statevector nicely
-        formatted = []
-        for i, amp in enumerate(state.data):
-            binary = format(i, f'0{len(ir["binary"])}b')
-            if abs(amp) > 1e-6:  # Show only non-zero entries
-                formatted.append(f"|{binary}⟩: {amp}")
-        if not formatted:
-            formatted.append("All amplitudes are 0.")
-        state_output.set("\n".join(formatted))
+        state_output.set(f"|{label}⟩: 1")
 
         # AST and IR JSON
         ast_text.delete("1.0", tk.END)
@@ -118,7 +110,12 @@ def run_converter():
         # Display circuit and bloch
         fig_circuit, fig_bloch = generate_plots(qc, state)
         display_plot(fig_circuit, plot_frame_circuit)
-        display_plot(fig_bloch, plot_frame_bloch)
+        if fig_bloch is not None:
+            display_plot(fig_bloch, plot_frame_bloch)
+        else:
+            for widget in plot_frame_bloch.winfo_children():
+                widget.destroy()
+            ttk.Label(plot_frame_bloch, text=f"Skipped for {len(label)} qubits").pack()
 
     except Exception as e:
         messagebox.showerror("Error", str(e))
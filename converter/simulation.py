@@ -1,7 +1,20 @@
+import os
+import sys
 from qiskit import QuantumCircuit
 from qiskit.quantum_info import Statevector
 
+# reversible.py lives with the main simulator; appended so it never shadows
+# this directory's own modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "FINAL-PROJECT"))
+from reversible import from_convert_ir, run_reversible
+
+# Above this many qubits no Statevector is built; the Bloch plot is skipped
+MAX_BLOCH_QUBITS = 8
+
 def simulate_ir(ir):
+    # The circuit, the final basis state label and a Statevector for the
+    # Bloch plot (None above MAX_BLOCH_QUBITS). The state itself comes from
+    # the reversible path, so any width runs without 2^n memory.
     num_qubits = len(ir["binary"])
     qc = QuantumCircuit(num_qubits)
 
@@ -9,5 +22,7 @@ def simulate_ir(ir):
         if instr["gate"] == "x":
             qc.x(instr["target"])
 
-    state = Statevector.from_instruction(qc)
-    return qc, state
+    instructions, qubit_index = from_convert_ir(ir)
+    label = format(run_reversible(instructions, qubit_index), f"0{num_qubits}b")
+    state = Statevector.from_label(label) if num_qubits <= MAX_BLOCH_QUBITS else None
+    return qc, label, state
@@ -7,7 +7,9 @@ def generate_plots(qc, statevector):
     ax_circuit = fig_circuit.add_subplot(111)
     qc.draw(output='mpl', ax=ax_circuit)
 
-    # Bloch Sphere Figure (direct from Qiskit)
+    # Bloch Sphere Figure (direct from Qiskit); none without a statevector
+    if statevector is None:
+        return fig_circuit, None
     fig_bloch = plot_bloch_multivector(statevector, title="Bloch Sphere")
     fig_bloch.set_size_inches(4, 4)  # set size directly
 
@@ -5,10 +5,10 @@ from tkinter import filedialog, messagebox, scrolledtext, ttk
 import os, json, re
 from parser import parse_qucpl
 from compiler import ast_to_ir
-from simulation import simulate, build_qiskit_circuit
+from simulation import simulate, build_qiskit_circuit, plot_bloch_vectors
 from visualize import visualize_circuit
 from qiskit.quantum_info import Statevector, partial_trace
-from qiskit.visualization import plot_histogram, plot_bloch_multivector
+from qiskit.visualization import plot_histogram
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
 import keyword
@@ -277,7 +277,7 @@ Tutorials:
                 fig = plot_histogram(counts)
             elif view == "Bloch":
                 state = Statevector.from_instruction(qc)
-                fig = plot_bloch_multivector(state)
+                fig = plot_bloch_vectors(state)
             elif view == "Timeline" and timeline_drawer:
                 fig = timeline_drawer(qc)
             elif view == "Density":
@@ -321,7 +321,7 @@ Tutorials:
                 text.insert(tk.END, f"{basis[i]}: {amp}\n")
             tk.Button(self.state_frame, text="Save Text", command=lambda: self.save_text_output(text, "statevector.txt")).pack()
 
-            fig = plot_bloch_multivector(state)
+            fig = plot_bloch_vectors(state)
             canvas = FigureCanvasTkAgg(fig, master=self.bloch_frame)
             canvas.draw()
             canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
@@ -1,8 +1,9 @@
 
 import json
+import numpy as np
 from qiskit import transpile, QuantumCircuit
 from qiskit_aer import Aer
-from qiskit.visualization import plot_histogram
+from qiskit.visualization import plot_histogram, plot_bloch_vector
 import matplotlib.pyplot as plt
 
 def build_qiskit_circuit(ir):
@@ -65,6 +66,36 @@ def build_qiskit_circuit(ir):
 
     return qc, classical_bits
 
+def reduced_density_matrices(state, n):
+    # 2x2 reduced density matrix of every qubit, shape (n, 2, 2), with qubit
+    # 0 as the most significant bit. One einsum per qubit over a (higher,
+    # qubit, lower) view traces the others out: O(n 2^n) in total.
+    state = np.asarray(state)
+    conj = state.conj()
+    rhos = np.empty((n, 2, 2), dtype=np.complex128)
+    for q in range(n):
+        shape = (2 ** q, 2, 2 ** (n - 1 - q))
+        rhos[q] = np.einsum('aib,ajb->ij', state.reshape(shape), conj.reshape(shape))
+    return rhos / np.trace(rhos, axis1=1, axis2=2).real[:, None, None]
+
+def bloch_vectors(state, n):
+    # (x, y, z) of every qubit, most significant first
+    rhos = reduced_density_matrices(state, n)
+    return np.stack([2 * rhos[:, 0, 1].real, -2 * rhos[:, 0, 1].imag,
+                     (rhos[:, 0, 0] - rhos[:, 1, 1]).real], axis=1)
+
+def plot_bloch_vectors(state):
+    # Drop-in for plot_bloch_multivector on a Qiskit Statevector. Qiskit
+    # numbers qubits from the least significant bit, so the vectors are
+    # reversed to put qubit 0 first.
+    n = state.num_qubits
+    vectors = bloch_vectors(state.data, n)[::-1]
+    fig = plt.figure(figsize=(5 * n, 5))
+    for i, vector in enumerate(vectors):
+        ax = fig.add_subplot(1, n, i + 1, projection="3d")
+        plot_bloch_vector(vector, title=f"qubit {i}", ax=ax)
+    return fig
+
 def simulate(ir_path, title):
     try:
         with open(ir_path) as f:
@@ -1,7 +1,7 @@
 import json
 import numpy as np
 import matplotlib.pyplot as plt
-from qutip import Bloch, Qobj, ket2dm, ptrace
+from qutip import Bloch
 import os
 
 # Define gates
@@ -16,12 +16,27 @@ GATES = {
     ])),
 }
 
+# The histogram and Bloch plots need the dense 2^n state; above this many
+# qubits they are skipped, so wide sparse runs never build it
+MAX_PLOT_QUBITS = 12
+
+# Amplitude dtype per execute() precision
+PRECISIONS = {
+    "double": np.complex128,
+    "single": np.complex64,
+}
+
+# Gates between renormalizations outside double precision; the same default
+# as FINAL-PROJECT's run_statevector, so both simulators drift alike
+RENORMALIZE_EVERY = 64
+
 def apply_gate(state, gate, targets, total_qubits):
     targets = list(targets)
+    gate = np.asarray(gate, dtype=state.dtype)
     if len(targets) == 1:
-        full_op = 1
+        full_op = np.ones((1, 1), dtype=state.dtype)
         for i in range(total_qubits):
-            full_op = np.kron(full_op, gate if i == targets[0] else np.eye(2))
+            full_op = np.kron(full_op, gate if i == targets[0] else np.eye(2, dtype=state.dtype))
         return full_op @ state
     elif len(targets) == 2:
         q1, q2 = targets
@@ -40,8 +55,39 @@ def apply_gate(state, gate, targets, total_qubits):
     else:
         raise ValueError("Only 1- or 2-qubit gates are supported.")
 
+def sparse_apply_gate(indices, amps, gate, targets, total_qubits):
+    """Apply a gate to a state kept as (basis indices, nonzero amplitudes)."""
+    k = len(targets)
+    masks = [1 << (total_qubits - 1 - q) for q in targets]
+    sub = np.zeros_like(indices)
+    for q in targets:
+        sub = (sub << 1) | ((indices >> (total_qubits - 1 - q)) & 1)
+    # Row r of the gate writes the bits of r onto the target qubits
+    rows = np.arange(2 ** k)
+    offsets = sum(((rows >> (k - 1 - j)) & 1) * m for j, m in enumerate(masks))
+    base = indices & ~sum(masks)
+    new_indices = (base[:, None] | offsets[None, :]).reshape(-1)
+    new_amps = (gate[:, sub].T * amps[:, None]).reshape(-1)
+    # Sum amplitudes landing on the same basis state and drop the zeros
+    unique, inverse = np.unique(new_indices, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    total = (np.bincount(inverse, weights=new_amps.real, minlength=len(unique))
+             + 1j * np.bincount(inverse, weights=new_amps.imag, minlength=len(unique)))
+    keep = np.abs(total) > 1e-12
+    return unique[keep], total[keep].astype(amps.dtype)
+
+def sparse_measure(indices, amps, qubits, total_qubits):
+    """apply_measure for a sparse state; collapses onto one basis index."""
+    probs = np.abs(amps).astype(np.float64) ** 2
+    collapsed_index = int(np.random.choice(indices, p=probs / probs.sum()))
+    bin_str = format(collapsed_index, f'0{total_qubits}b')
+    outcome = [int(bin_str[total_qubits - 1 - q]) for q in qubits]
+    return np.array([collapsed_index]), np.ones(1, dtype=amps.dtype), outcome, collapsed_index
+
 def apply_measure(state, qubits, cregs_out, total_qubits):
-    probs = np.abs(state) ** 2
+    # Probabilities in float64 so they sum to 1 for single-precision states too
+    probs = np.abs(state).astype(np.float64) ** 2
+    probs /= probs.sum()
     collapsed_index = np.random.choice(len(state), p=probs)
     bin_str = format(collapsed_index, f'0{total_qubits}b')
     outcome = [int(bin_str[total_qubits - 1 - q]) for q in qubits]
@@ -61,70 +107,115 @@ def plot_histogram(state, num_qubits):
     plt.savefig("final_histogram.png")
     plt.show()
 
+def reduced_density_matrices(state, num_qubits):
+    """2x2 reduced density matrix of every qubit, shape (num_qubits, 2, 2).
+
+    Each qubit splits the state into (higher, qubit, lower) axes and one
+    einsum traces the others out, so all of them cost O(n 2^n).
+    """
+    conj = state.conj()
+    rhos = np.empty((num_qubits, 2, 2), dtype=np.complex128)
+    for q in range(num_qubits):
+        shape = (2 ** q, 2, 2 ** (num_qubits - 1 - q))
+        rhos[q] = np.einsum('aib,ajb->ij', state.reshape(shape), conj.reshape(shape))
+    return rhos / np.trace(rhos, axis1=1, axis2=2).real[:, None, None]
+
+def bloch_vectors(state, num_qubits):
+    """(x, y, z) Bloch vector of every qubit, from its reduced density matrix."""
+    rhos = reduced_density_matrices(state, num_qubits)
+    return np.stack([2 * rhos[:, 0, 1].real, -2 * rhos[:, 0, 1].imag,
+                     (rhos[:, 0, 0] - rhos[:, 1, 1]).real], axis=1)
+
 def visualize_bloch_spheres(state, num_qubits, save_dir="bloch_spheres"):
     """Visualize and save Bloch spheres for individual qubits."""
     print("\n🧭 Generating Bloch spheres...")
 
     os.makedirs(save_dir, exist_ok=True)
 
-    dim = 2 ** num_qubits
-    state_qobj = Qobj(state.reshape((dim, 1)), dims=[[2]*num_qubits, [1]*num_qubits])
-    rho = ket2dm(state_qobj)
-
-    for i in range(num_qubits):
+    for i, vector in enumerate(bloch_vectors(state, num_qubits)):
         bloch = Bloch()
-        qubit_rho = ptrace(rho, i)
-        bloch.add_states(qubit_rho)
+        bloch.add_vectors(vector)
         bloch.title = f"Bloch Sphere for Qubit {i}"
         bloch.render()  # prepare the figure
         filepath = os.path.join(save_dir, f"bloch_qubit_{i}.png")
         bloch.fig.savefig(filepath, dpi=300)
         print(f"✅ Saved: {filepath}")
 
-def simulate(ir_path="ir.json"):
-    with open(ir_path) as f:
-        ir = json.load(f)
+def execute(ir, sparse=False, fill_threshold=0.25, precision="double",
+            renormalize_every=RENORMALIZE_EVERY, log=print):
+    """Run the IR operations. With sparse=True only nonzero amplitudes are
+    stored until more than fill_threshold of the 2^n entries are nonzero.
+    Outside double precision the state is renormalized every
+    renormalize_every gates. Returns (state, indices, amps, cregs); state is
+    None while the run is still sparse."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    dtype = PRECISIONS[precision]
 
     num_qubits = ir["qubits"]
     num_cregs = ir["cregs"]
     ops = ir["oper"]
 
-    state = np.zeros(2 ** num_qubits, dtype=complex)
-    state[0] = 1.0
+    indices = amps = None
+    if sparse:
+        state = None
+        indices, amps = np.zeros(1, dtype=np.int64), np.ones(1, dtype=dtype)
+    else:
+        state = np.zeros(2 ** num_qubits, dtype=dtype)
+        state[0] = 1.0
     cregs = [0 for _ in range(num_cregs)]
+    applied = 0
 
     def resolve_creg(arg):
         return int(arg[1:]) if isinstance(arg, str) and arg.startswith("c") else int(arg)
 
+    def renormalize():
+        nonlocal state, amps
+        if state is None:
+            amps = amps / np.linalg.norm(amps)
+        else:
+            state = state / np.linalg.norm(state)
+
     def execute_block(block):
-        nonlocal state, cregs
+        nonlocal state, indices, amps, cregs, applied
         for op in block:
             if "op" in op and op["op"] == "convert":
-                print(f"[i] Skipping convert operation with value {op['value']}")
+                log(f"[i] Skipping convert operation with value {op['value']}")
                 continue
 
             gate = op.get("gate")
 
-            if gate in GATES:
+            if gate in GATES and state is None:
+                _, mat = GATES[gate]
+                indices, amps = sparse_apply_gate(indices, amps, mat, op["qubits"], num_qubits)
+                if len(indices) > fill_threshold * 2 ** num_qubits:
+                    state = np.zeros(2 ** num_qubits, dtype=dtype)
+                    state[indices] = amps
+                    log(f"[i] {len(indices)} nonzero amplitudes, switching to dense")
+
+            elif gate in GATES:
                 _, mat = GATES[gate]
                 state = apply_gate(state, mat, op["qubits"], num_qubits)
 
             elif gate == "measure":
-                state, measured_vals, _ = apply_measure(state, op["qubits"], op["cregs"], num_qubits)
+                if state is None:
+                    indices, amps, measured_vals, _ = sparse_measure(indices, amps, op["qubits"], num_qubits)
+                else:
+                    state, measured_vals, _ = apply_measure(state, op["qubits"], op["cregs"], num_qubits)
                 for q, c, val in zip(op["qubits"], op["cregs"], measured_vals):
                     cregs[c] = val
-                    print(f"[m] Measured q{q} → c{c} = {val}")
+                    log(f"[m] Measured q{q} → c{c} = {val}")
 
             elif gate == "barrier":
-                print(f"[b] Barrier on qubits: {op['qubits']}")
+                log(f"[b] Barrier on qubits: {op['qubits']}")
 
             elif gate == "print":
                 out = [cregs[resolve_creg(arg)] for arg in op["args"]]
-                print(f"[p] Print → {out}")
+                log(f"[p] Print → {out}")
 
             elif gate == "if":
                 cond = cregs[op["creg"]] == op["val"]
-                print(f"[if] Condition c{op['creg']} == {op['val']} → {'✅' if cond else '❌'}")
+                log(f"[if] Condition c{op['creg']} == {op['val']} → {'✅' if cond else '❌'}")
                 if cond:
                     execute_block(op["body"])
                 elif "else" in op:
@@ -132,8 +223,36 @@ def simulate(ir_path="ir.json"):
             else:
                 raise ValueError(f"Unknown operation: {op}")
 
-    print("🚀 Starting QuCPL Simulation...\n")
+            if gate in GATES and dtype != np.complex128:
+                applied += 1
+                if applied % renormalize_every == 0:
+                    renormalize()
+
     execute_block(ops)
+    if dtype != np.complex128:
+        renormalize()
+    return state, indices, amps, cregs
+
+def nonzero_entries(state, indices, amps):
+    """(indices, amps) of a result from execute, dense or sparse."""
+    if state is None:
+        return indices, amps
+    indices = np.flatnonzero(state)
+    return indices, state[indices]
+
+def simulate(ir_path="ir.json", sparse=False, fill_threshold=0.25, precision="double",
+             renormalize_every=RENORMALIZE_EVERY, check_fidelity=False):
+    """Run an IR file and report registers, amplitudes and plots. See execute
+    for the sparse and precision options; check_fidelity repeats the run in
+    double precision with the same random draws and prints the overlap."""
+    with open(ir_path) as f:
+        ir = json.load(f)
+
+    num_qubits = ir["qubits"]
+
+    print("🚀 Starting QuCPL Simulation...\n")
+    rng_state = np.random.get_state()
+    state, indices, amps, cregs = execute(ir, sparse, fill_threshold, precision, renormalize_every)
 
     print("\n✅ Simulation finished.")
     print("🧠 Final classical registers:")
@@ -141,11 +260,37 @@ def simulate(ir_path="ir.json"):
         print(f"  c{i} = {val}")
 
     print("\n🔬 Non-zero quantum amplitudes:")
-    for i, amp in enumerate(state):
+    if state is None:
+        order = np.argsort(indices)
+        nonzero = zip(indices[order], amps[order])
+    else:
+        nonzero = enumerate(state)
+    for i, amp in nonzero:
         if abs(amp) > 1e-6:
             print(f"  |{format(i, f'0{num_qubits}b')}⟩: {amp.real:.4f} + {amp.imag:.4f}j")
 
+    if check_fidelity and precision != "double":
+        after = np.random.get_state()
+        np.random.set_state(rng_state)
+        ref_state, ref_indices, ref_amps, ref_cregs = execute(
+            ir, sparse, fill_threshold, "double", log=lambda *args: None)
+        np.random.set_state(after)
+        # Overlap over the basis states both runs hold, without densifying
+        ref_indices, ref_amps = nonzero_entries(ref_state, ref_indices, ref_amps)
+        run_indices, run_amps = nonzero_entries(state, indices, amps)
+        _, i, j = np.intersect1d(ref_indices, run_indices, return_indices=True)
+        fidelity = abs(np.vdot(ref_amps[i], run_amps[j].astype(np.complex128))) ** 2
+        print(f"\n🎯 Fidelity of {precision} precision against double: {fidelity:.10f}")
+        if ref_cregs != cregs:
+            print("   (measurement outcomes differed between the two runs)")
+
     # 🎯 Visualizations
+    if num_qubits > MAX_PLOT_QUBITS:
+        print(f"\n[PLOTS] Skipped for {num_qubits} qubits (limit {MAX_PLOT_QUBITS})")
+        return
+    if state is None:
+        state = np.zeros(2 ** num_qubits, dtype=amps.dtype)
+        state[indices] = amps
     plot_histogram(state, num_qubits)
     visualize_bloch_spheres(state, num_qubits)
 